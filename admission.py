@@ -0,0 +1,156 @@
+import math
+import time
+import threading
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of being queued or run"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"request rejected: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class PriorityClass:
+    """Limits for one class of traffic"""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_queue_time: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_time = max_queue_time
+
+        self.running = 0
+        self.queue = deque()
+        self.admitted = 0
+        self.rejected = defaultdict(int)
+        self.queue_times = deque(maxlen=1000)
+        # Moving average of time spent running, used for Retry-After
+        self.service_time = 0.1
+
+
+class AdmissionController:
+    """
+    Priority-aware admission control with bounded queues
+
+    At most ``capacity`` requests run at once. Classes are listed from the
+    highest priority down: a queued request of a higher class is always
+    admitted before one of a lower class, and each class may also cap its
+    own concurrency so lower classes cannot take every slot. Requests wait
+    in a bounded FIFO queue for at most the class's ``max_queue_time``;
+    when the queue is full or the wait runs out they are rejected with
+    AdmissionRejected rather than adding to the latency of everyone else.
+    """
+
+    def __init__(self, capacity: int, classes: List[PriorityClass],
+                 max_per_client: Optional[int] = None):
+        self.capacity = capacity
+        self.classes = {c.name: c for c in classes}
+        self._order = [c.name for c in classes]
+        self.max_per_client = max_per_client
+        self._running = 0
+        self._per_client = defaultdict(int)
+        self._cond = threading.Condition()
+
+    def _can_run(self, cls: PriorityClass) -> bool:
+        if self._running >= self.capacity or cls.running >= cls.max_concurrent:
+            return False
+        # Higher classes with queued requests that could run go first
+        for name in self._order:
+            if name == cls.name:
+                return True
+            higher = self.classes[name]
+            if higher.queue and higher.running < higher.max_concurrent:
+                return False
+        return True
+
+    def _retry_after(self, cls: PriorityClass) -> float:
+        backlog = len(cls.queue) + cls.running + 1
+        return max(1.0, math.ceil(backlog * cls.service_time / max(1, cls.max_concurrent)))
+
+    @contextmanager
+    def admit(self, priority: str, client_id: Optional[str] = None):
+        """
+        Hold a slot for the duration of the ``with`` block
+
+        Raises:
+            AdmissionRejected: if the client is over its concurrency cap, the
+                class queue is full, or the request waited too long
+        """
+        cls = self.classes[priority]
+        ticket = object()
+
+        with self._cond:
+            if self.max_per_client and client_id is not None \
+                    and self._per_client[client_id] >= self.max_per_client:
+                cls.rejected["client_limit"] += 1
+                raise AdmissionRejected("client_limit", self._retry_after(cls))
+
+            if (cls.queue or not self._can_run(cls)) and len(cls.queue) >= cls.max_queue:
+                cls.rejected["queue_full"] += 1
+                raise AdmissionRejected("queue_full", self._retry_after(cls))
+
+            self._per_client[client_id] += 1
+            cls.queue.append(ticket)
+            enqueued = time.monotonic()
+            deadline = enqueued + cls.max_queue_time
+            try:
+                while not (cls.queue[0] is ticket and self._can_run(cls)):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        cls.rejected["queue_timeout"] += 1
+                        raise AdmissionRejected("queue_timeout", self._retry_after(cls))
+                    self._cond.wait(remaining)
+            except BaseException:
+                cls.queue.remove(ticket)
+                self._release_client(client_id)
+                self._cond.notify_all()
+                raise
+
+            cls.queue.popleft()
+            cls.running += 1
+            cls.admitted += 1
+            cls.queue_times.append(time.monotonic() - enqueued)
+            self._running += 1
+            # The next queued request may be able to run as well
+            self._cond.notify_all()
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                cls.running -= 1
+                cls.service_time = 0.9 * cls.service_time + 0.1 * (time.monotonic() - started)
+                self._running -= 1
+                self._release_client(client_id)
+                self._cond.notify_all()
+
+    def _release_client(self, client_id: Optional[str]) -> None:
+        self._per_client[client_id] -= 1
+        if self._per_client[client_id] <= 0:
+            del self._per_client[client_id]
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of queue and admission counters for each class"""
+        with self._cond:
+            result = {"capacity": self.capacity, "running": self._running, "classes": {}}
+            for name in self._order:
+                cls = self.classes[name]
+                waits = sorted(cls.queue_times)
+                result["classes"][name] = {
+                    "running": cls.running,
+                    "queued": len(cls.queue),
+                    "max_concurrent": cls.max_concurrent,
+                    "max_queue": cls.max_queue,
+                    "admitted": cls.admitted,
+                    "rejected": dict(cls.rejected),
+                    "queue_time_p50": waits[len(waits) // 2] if waits else 0.0,
+                    "queue_time_p99": waits[min(len(waits) - 1, len(waits) * 99 // 100)] if waits else 0.0,
+                    "service_time_avg": cls.service_time,
+                }
+            return result
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Claude PubMed 助手批次搜索工具
+
+從檔案讀取查詢並發執行，每個查詢只抓取一次，同時寫出 JSON 記錄（JSONL）
+與 Claude 友好的 Markdown。結果在完成時立即追加寫入，中斷後重新執行會跳過
+JSONL 中已成功的查詢。
+
+查詢檔案每行一個查詢，或一個 JSON 物件，例如:
+    covid vaccine efficacy
+    {"query": "crispr therapy", "max_results": 50, "sort": "date", "since_year": 2020}
+空行與以 # 開頭的行會被忽略。
+
+用法:
+    python batch_search.py queries.txt -o results                 # 直接使用 PubMedClient
+    python batch_search.py queries.txt -o results --server http://localhost:8000
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+from dotenv import load_dotenv
+
+import httpx
+
+from pubmed_client import PubMedClient
+from pubmed_cache import SharedCache, SharedRateLimiter, ApiKeyPool
+from pubmed_format import build_query, format_for_claude
+
+# 加載環境變量（與服務器相同的配置，共用快取與速率限制）
+load_dotenv()
+
+API_KEY = os.getenv("PUBMED_API_KEY")
+BASE_URL = os.getenv("PUBMED_BASE_URL", PubMedClient.BASE_URL)
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(".cache", "pubmed.sqlite3"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "3600"))
+CACHE_MAX_STALE = float(os.getenv("CACHE_MAX_STALE", "86400"))
+ARTICLE_TTL = float(os.getenv("ARTICLE_TTL", str(30 * 86400)))
+RATE_LIMIT = float(os.getenv("RATE_LIMIT", "10" if API_KEY else "3"))
+API_KEYS = [k.strip() for k in os.getenv("PUBMED_API_KEYS", "").split(",") if k.strip()]
+RATE_LIMIT_PER_KEY = float(os.getenv("RATE_LIMIT_PER_KEY", "10"))
+KEY_COOLDOWN = float(os.getenv("KEY_COOLDOWN", "10"))
+
+# 服務器返回 429 時的最多重試次數
+MAX_RETRIES = 5
+
+
+def read_queries(path, max_results, sort):
+    """讀取查詢檔案，返回查詢參數列表"""
+    specs = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                try:
+                    spec = json.loads(line)
+                except ValueError as e:
+                    raise SystemExit(f"{path}:{line_number}: 無效的 JSON: {e}")
+            else:
+                spec = {"query": line}
+            since_year = str(spec.get("since_year") or "").strip()
+            specs.append({
+                "query": " ".join(str(spec.get("query", "")).split()),
+                "max_results": int(spec.get("max_results", max_results)),
+                "sort": spec.get("sort", sort),
+                "since_year": int(since_year) if since_year.isdigit() else None,
+            })
+    return [spec for spec in specs if spec["query"]]
+
+
+def spec_key(spec):
+    """查詢的唯一標識，用於去重與斷點續跑"""
+    return json.dumps(spec, sort_keys=True, ensure_ascii=False)
+
+
+def load_completed(jsonl_path):
+    """讀取已成功完成的查詢；截掉上次中斷時寫了一半的最後一行"""
+    completed = set()
+    if not os.path.exists(jsonl_path):
+        return completed
+
+    with open(jsonl_path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    for line in data[:end].decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if "error" not in record:
+            completed.add(record["key"])
+    return completed
+
+
+def estimated_calls(max_results):
+    """一次未命中快取的搜索所需的上游請求數（esearch + efetch 批次）"""
+    return 1 + math.ceil(max_results / PubMedClient.EFETCH_BATCH_SIZE)
+
+
+class DirectBackend:
+    """在本進程中使用 PubMedClient，與服務器共用快取與速率限制"""
+
+    name = "PubMedClient"
+
+    def __init__(self):
+        cache = (SharedCache(CACHE_PATH, query_ttl=CACHE_TTL, max_stale=CACHE_MAX_STALE,
+                             article_ttl=ARTICLE_TTL)
+                 if CACHE_PATH else None)
+        rate_limiter = SharedRateLimiter(CACHE_PATH, rate=RATE_LIMIT) if CACHE_PATH else None
+        key_pool = (ApiKeyPool(CACHE_PATH, API_KEYS, rate=RATE_LIMIT_PER_KEY, cooldown=KEY_COOLDOWN)
+                    if CACHE_PATH and API_KEYS else None)
+        self.client = PubMedClient(api_key=API_KEY, base_url=BASE_URL, cache=cache,
+                                   rate_limiter=rate_limiter, key_pool=key_pool)
+
+    @property
+    def upstream_calls(self):
+        return self.client.upstream_calls
+
+    async def search(self, spec):
+        return await self.client.search_with_status(
+            query=build_query(spec["query"], spec["since_year"]),
+            max_results=spec["max_results"], sort=spec["sort"])
+
+    async def close(self):
+        await self.client.close()
+
+
+class ServerBackend:
+    """透過服務器的 /api/search 搜索（批次優先級）"""
+
+    name = "server"
+
+    def __init__(self, server_url):
+        self.server_url = server_url.rstrip("/")
+        self.client = httpx.AsyncClient(timeout=120.0)
+        # 服務器不報告上游請求數，按未命中快取的查詢估算
+        self.upstream_calls = 0
+
+    async def search(self, spec):
+        payload = {key: value for key, value in spec.items() if value is not None}
+        for attempt in range(MAX_RETRIES + 1):
+            response = await self.client.post(
+                f"{self.server_url}/api/search", json=payload,
+                headers={"X-Priority": "batch"})
+            if response.status_code not in (429, 503) or attempt == MAX_RETRIES:
+                break
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+        response.raise_for_status()
+
+        state = response.headers.get("X-Cache", "MISS").lower()
+        if state == "miss":
+            self.upstream_calls += estimated_calls(spec["max_results"])
+        return response.json(), {"cache": state, "age": float(response.headers.get("Age", 0))}
+
+    async def close(self):
+        await self.client.aclose()
+
+
+async def run_batch(specs, backend, output, concurrency):
+    """並發執行查詢，每完成一個就追加寫入 JSONL 與 Markdown"""
+    jsonl_path, markdown_path = f"{output}.jsonl", f"{output}.md"
+    completed = load_completed(jsonl_path)
+
+    # 相同查詢只執行一次
+    unique = {}
+    for spec in specs:
+        unique.setdefault(spec_key(spec), spec)
+    pending = {key: spec for key, spec in unique.items() if key not in completed}
+
+    summary = {"input": len(specs), "unique": len(unique), "resumed": len(unique) - len(pending),
+               "done": 0, "failed": 0, "hit": 0, "stale": 0, "miss": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(key, spec):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                articles, status = await backend.search(spec)
+                return key, spec, articles, status, None, time.perf_counter() - started
+            except Exception as e:
+                return key, spec, None, None, e, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with open(jsonl_path, "a", encoding="utf-8") as jsonl, \
+            open(markdown_path, "a", encoding="utf-8") as markdown:
+        tasks = [asyncio.ensure_future(run_one(key, spec)) for key, spec in pending.items()]
+        for future in asyncio.as_completed(tasks):
+            key, spec, articles, status, error, elapsed = await future
+            record = dict(spec, key=key, elapsed_ms=round(elapsed * 1000))
+            if error is not None:
+                summary["failed"] += 1
+                record["error"] = str(error) or type(error).__name__
+                print(f"  失敗: {spec['query']} ({record['error']})")
+            else:
+                summary["done"] += 1
+                summary[status["cache"]] = summary.get(status["cache"], 0) + 1
+                record.update(cache=status["cache"], articles=articles)
+                # 先寫 Markdown，JSONL 記錄代表查詢已完成
+                markdown.write(format_for_claude(spec["query"], articles) + "\n\n")
+                markdown.flush()
+                print(f"  [{summary['done'] + summary['failed']}/{len(pending)}] {spec['query']}: "
+                      f"{len(articles)} 篇 ({status['cache']}, {elapsed * 1000:.0f} ms)")
+            jsonl.write(json.dumps(record, ensure_ascii=False) + "\n")
+            jsonl.flush()
+
+    summary["elapsed"] = time.perf_counter() - started
+    return summary
+
+
+def print_summary(summary, backend):
+    elapsed = summary["elapsed"]
+    processed = summary["done"] + summary["failed"]
+    label = "估計" if isinstance(backend, ServerBackend) else "實際"
+
+    print("\n" + "=" * 50)
+    print(f"輸入查詢: {summary['input']}（不重複 {summary['unique']}，已完成跳過 {summary['resumed']}）")
+    print(f"本次完成: {summary['done']}，失敗: {summary['failed']}，"
+          f"耗時 {elapsed:.1f} 秒，{processed / elapsed if elapsed else 0:.1f} 查詢/秒")
+    print(f"快取: 命中 {summary['hit']}，過期 {summary['stale']}，未命中 {summary['miss']}")
+    print(f"上游請求（{label}）: {backend.upstream_calls}（重複的查詢與快取命中不發出請求）")
+
+
+async def main_async(args):
+    specs = read_queries(args.queries, args.max_results, args.sort)
+    if not specs:
+        print("查詢檔案中沒有查詢")
+        return 1
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    backend = ServerBackend(args.server) if args.server else DirectBackend()
+    print(f"使用 {backend.name} 執行 {len(specs)} 個查詢，並發數 {args.concurrency}")
+    try:
+        summary = await run_batch(specs, backend, args.output, args.concurrency)
+    finally:
+        await backend.close()
+
+    print_summary(summary, backend)
+    print(f"結果: {args.output}.jsonl, {args.output}.md")
+    return 1 if summary["failed"] else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Claude PubMed 助手批次搜索")
+    parser.add_argument("queries", help="查詢檔案，每行一個查詢或 JSON 物件")
+    parser.add_argument("-o", "--output", default="results", help="輸出檔名前綴（生成 .jsonl 與 .md）")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="同時執行的查詢數")
+    parser.add_argument("--server", help="透過服務器搜索，例如 http://localhost:8000")
+    parser.add_argument("--max-results", type=int, default=10, help="預設最大結果數")
+    parser.add_argument("--sort", default="relevance", choices=["relevance", "date"], help="預設排序方式")
+    args = parser.parse_args()
+    try:
+        return asyncio.run(main_async(args))
+    except KeyboardInterrupt:
+        print("\n已中斷，已完成的結果已保存，重新執行相同命令即可繼續")
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Columnar analytics over a large synthetic corpus
+
+Generates articles with skewed journal, author and keyword frequencies,
+encodes them with ArticleColumns, saves and memory-maps the snapshot, and
+times the aggregates behind /api/analytics (whole corpus, a year range, and
+a set of PMIDs). For comparison, the same top-N aggregates are computed
+with plain dict/Counter loops over the article dicts, which is what API
+clients had to do before.
+
+Usage: python benchmarks/bench_analytics.py [--articles 1000000]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pubmed_columnar import ArticleColumns
+
+
+def generate(count, seed=0):
+    """Article dicts shaped like PubMedClient results (only the aggregated fields)"""
+    rng = np.random.default_rng(seed)
+    journals = [f"Journal of Topic {i}" for i in range(5000)]
+    authors = [f"Author {i}" for i in range(200000)]
+    keywords = [f"keyword {i}" for i in range(20000)]
+    months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+    journal_ids = np.minimum(rng.zipf(1.3, count), len(journals)) - 1
+    years = rng.integers(1970, 2026, count)
+    author_counts = rng.integers(1, 9, count)
+    author_ids = np.minimum(rng.zipf(1.5, int(author_counts.sum())), len(authors)) - 1
+    keyword_counts = rng.integers(0, 6, count)
+    keyword_ids = np.minimum(rng.zipf(1.4, int(keyword_counts.sum())), len(keywords)) - 1
+
+    a = k = 0
+    for i in range(count):
+        yield {
+            "pmid": str(10000000 + i),
+            "journal": journals[journal_ids[i]],
+            "publication_date": f"{years[i]} {months[i % 12]}",
+            "authors": [authors[j] for j in author_ids[a:a + author_counts[i]]],
+            "keywords": [keywords[j] for j in keyword_ids[k:k + keyword_counts[i]]],
+        }
+        a += author_counts[i]
+        k += keyword_counts[i]
+
+
+def dict_aggregate(articles, top, since_year=None):
+    """Baseline: aggregate article dicts with Python loops"""
+    journals, authors, keywords, years = Counter(), Counter(), Counter(), Counter()
+    count = 0
+    for article in articles:
+        year = article["publication_date"][:4]
+        if since_year is not None and int(year) < since_year:
+            continue
+        count += 1
+        journals[article["journal"]] += 1
+        authors.update(set(article["authors"]))
+        keywords.update({kw.strip().lower() for kw in article["keywords"]})
+        years[year] += 1
+    return {"articles": count, "top_journals": journals.most_common(top),
+            "top_authors": authors.most_common(top), "top_keywords": keywords.most_common(top),
+            "years": dict(years)}
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar analytics benchmark")
+    parser.add_argument("--articles", type=int, default=1000000)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"generating {args.articles} articles...")
+    articles = list(generate(args.articles))
+
+    start = time.perf_counter()
+    columns = ArticleColumns.from_articles(articles)
+    print(f"encode:  {time.perf_counter() - start:.2f}s  "
+          f"({len(columns.journals)} journals, {len(columns.authors)} authors, "
+          f"{len(columns.keywords)} keywords, {columns.author_codes.size} author links)")
+
+    path = os.path.join(tempfile.mkdtemp(), "articles.columns")
+    start = time.perf_counter()
+    columns.save(path)
+    size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    print(f"save:    {time.perf_counter() - start:.2f}s  ({size / 2 ** 20:.0f} MiB)")
+
+    start = time.perf_counter()
+    mapped = ArticleColumns.load(path)
+    print(f"load:    {(time.perf_counter() - start) * 1000:.1f}ms (memory-mapped)")
+
+    sample = [a["pmid"] for a in articles[::100]]
+    cases = [
+        ("all articles", lambda: mapped.aggregate(None, args.top),
+         lambda: dict_aggregate(articles, args.top)),
+        ("since 2015", lambda: mapped.aggregate(mapped.select(since_year=2015), args.top),
+         lambda: dict_aggregate(articles, args.top, since_year=2015)),
+        (f"{len(sample)} pmids", lambda: mapped.aggregate(mapped.select(pmids=sample), args.top),
+         None),
+    ]
+
+    print(f"\n{'aggregate':<14} {'columnar ms':>12} {'dict loop ms':>13} {'speedup':>8}")
+    for name, columnar, baseline in cases:
+        columnar_time, result = timed(columnar)
+        if baseline is None:
+            print(f"{name:<14} {columnar_time * 1000:>12.1f} {'-':>13} {'-':>8}")
+            continue
+        baseline_time, expected = timed(baseline, repeat=1)
+        assert result["articles"] == expected["articles"]
+        assert [(j["name"], j["count"]) for j in result["top_journals"]] == expected["top_journals"]
+        assert sum(result["years"].values()) == sum(expected["years"].values())
+        print(f"{name:<14} {columnar_time * 1000:>12.1f} {baseline_time * 1000:>13.1f} "
+              f"{baseline_time / columnar_time:>7.0f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Batch CLI vs. one query at a time
+
+Runs the same query file (with some repeated queries) three ways, each
+with an empty cache, against the stub E-utilities server:
+
+  per-line    what examples/basic_usage.py does for every line: POST
+              /api/search, then /api/claude_format, one query at a time
+  cli server  batch_search.py --server (concurrent, one fetch per query)
+  cli direct  batch_search.py using PubMedClient in-process
+
+Reports queries/sec and the upstream calls the stub actually received.
+
+Usage: python benchmarks/bench_batch_cli.py [--queries 60] [--concurrency 4]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_eutils import StubEutils
+from load_test_workers import free_port, wait_for, post_json
+
+
+def start_server(stub, args, tmp):
+    port = free_port()
+    env = dict(os.environ, HOST="127.0.0.1", PORT=str(port), DEBUG="False",
+               PUBMED_BASE_URL=stub.url, RATE_LIMIT=str(args.rate_limit),
+               CACHE_PATH=os.path.join(tmp, "server.sqlite3"), WARMUP_ENABLED="False")
+    proc = subprocess.Popen([sys.executable, "pubmed_server.py"], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    if not wait_for(base_url + "/healthz"):
+        proc.kill()
+        raise RuntimeError("server failed to start")
+    return proc, base_url
+
+
+def per_line(base_url, queries, max_results):
+    for query in queries:
+        payload = {"query": query, "max_results": max_results}
+        post_json(f"{base_url}/api/search", payload)
+        post_json(f"{base_url}/api/claude_format", payload)
+
+
+def run_cli(stub, args, tmp, query_file, server_url=None):
+    env = dict(os.environ, PUBMED_BASE_URL=stub.url, RATE_LIMIT=str(args.rate_limit),
+               CACHE_PATH=os.path.join(tmp, "cli.sqlite3"))
+    command = [sys.executable, "batch_search.py", query_file, "-o", os.path.join(tmp, "results"),
+               "-c", str(args.concurrency), "--max-results", str(args.max_results)]
+    if server_url:
+        command += ["--server", server_url]
+    subprocess.run(command, cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+
+def measure(stub, fn):
+    before = stub.upstream_calls()
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start, stub.upstream_calls() - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch CLI benchmark")
+    parser.add_argument("--queries", type=int, default=60)
+    parser.add_argument("--repeat-every", type=int, default=5, help="every n-th line repeats an earlier query")
+    parser.add_argument("--max-results", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate-limit", type=float, default=10.0)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub upstream latency (s)")
+    args = parser.parse_args()
+
+    queries = [f"batch topic {i // args.repeat_every if i % args.repeat_every == 0 else i}"
+               for i in range(args.queries)]
+    stub = StubEutils(latency=args.latency).start()
+
+    results = []
+    tmp = tempfile.mkdtemp()
+    proc, base_url = start_server(stub, args, tmp)
+    try:
+        results.append(("per-line", *measure(stub, lambda: per_line(base_url, queries, args.max_results))))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    tmp = tempfile.mkdtemp()
+    query_file = os.path.join(tmp, "queries.txt")
+    with open(query_file, "w") as f:
+        f.write("\n".join(queries) + "\n")
+    proc, base_url = start_server(stub, args, tmp)
+    try:
+        results.append(("cli server", *measure(stub, lambda: run_cli(stub, args, tmp, query_file, base_url))))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    tmp = tempfile.mkdtemp()
+    results.append(("cli direct", *measure(stub, lambda: run_cli(stub, args, tmp, query_file))))
+
+    print(f"{len(queries)} queries ({len(set(queries))} distinct), max_results={args.max_results}\n")
+    print(f"{'mode':<11} {'seconds':>8} {'queries/s':>10} {'upstream calls':>15}")
+    for name, elapsed, calls in results:
+        print(f"{name:<11} {elapsed:>8.1f} {len(queries) / elapsed:>10.1f} {calls:>15}")
+
+    stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
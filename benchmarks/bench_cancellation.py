@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Upstream work left behind by clients that give up
+
+Runs pubmed_server against a slow stub E-utilities server and counts the
+upstream requests the stub still answers after the client is gone (the
+stub counts requests whose client hung up as "abandoned" instead):
+
+  abandoned     distinct searches whose clients time out before the stub
+                answers; upstream calls still answered afterwards
+  rate budget   with a low RATE_LIMIT, the same abandoned searches followed
+                by one search from a patient client: its latency shows
+                whether the abandoned ones still consumed rate-limit tokens
+  coalesced     three clients send the same search, two of them give up;
+                the remaining one must still get its results
+  deadline      a search with deadlines.total below the stub latency
+
+Pass --server-root to run another checkout of the server for comparison.
+
+Usage: python benchmarks/bench_cancellation.py [--latency 1.0] [--clients 8]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import itertools
+import subprocess
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_eutils import StubEutils
+from load_test_workers import free_port, wait_for
+
+_counter = itertools.count()
+
+
+def start_server(stub, root, rate_limit):
+    port = free_port()
+    env = dict(os.environ, HOST="127.0.0.1", PORT=str(port), DEBUG="False",
+               PUBMED_BASE_URL=stub.url, RATE_LIMIT=str(rate_limit), WARMUP_ENABLED="False",
+               CLIENT_ID_HEADER="X-Client-Id",
+               CACHE_PATH=os.path.join(tempfile.mkdtemp(), "cache.sqlite3"))
+    proc = subprocess.Popen([sys.executable, "pubmed_server.py"], cwd=root, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    if not wait_for(base_url + "/healthz"):
+        proc.kill()
+        raise RuntimeError("server failed to start")
+    return proc, base_url
+
+
+def search(base_url, payload, timeout):
+    """POST /api/search; returns the status code, or None if the client gave up"""
+    # One client id per request so the per-client admission limit does not apply
+    request = urllib.request.Request(f"{base_url}/api/search", data=json.dumps(payload).encode(),
+                                     headers={"Content-Type": "application/json",
+                                              "X-Client-Id": f"bench-{next(_counter)}"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def in_parallel(calls):
+    results = [None] * len(calls)
+
+    def run(index, fn):
+        results[index] = fn()
+
+    threads = [threading.Thread(target=run, args=(i, fn)) for i, fn in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def fresh_query():
+    return f"cancellation {next(_counter)}"
+
+
+def settle(stub, args):
+    """Wait until the stub has answered or dropped everything still in flight"""
+    time.sleep(args.latency * 2 + 1.0)
+    return dict(stub.stats)
+
+
+def answered(before, after):
+    return sum(after[k] - before[k] for k in ("esearch", "efetch"))
+
+
+def run_scenarios(stub, args, root):
+    results = {}
+
+    proc, base_url = start_server(stub, root, rate_limit=50)
+    try:
+        before = dict(stub.stats)
+        in_parallel([lambda: search(base_url, {"query": fresh_query(), "max_results": 200}, args.give_up)
+                     for _ in range(args.clients)])
+        after = settle(stub, args)
+        results["abandoned"] = (answered(before, after), after["abandoned"] - before["abandoned"])
+
+        before = dict(stub.stats)
+        query = fresh_query()
+        statuses = in_parallel([
+            lambda: search(base_url, {"query": query, "max_results": 200}, args.give_up),
+            lambda: search(base_url, {"query": query, "max_results": 200}, args.give_up),
+            lambda: search(base_url, {"query": query, "max_results": 200}, 60),
+        ])
+        after = settle(stub, args)
+        results["coalesced"] = (answered(before, after), after["abandoned"] - before["abandoned"], statuses[2])
+
+        before = dict(stub.stats)
+        start = time.perf_counter()
+        status = search(base_url, {"query": fresh_query(), "max_results": 200,
+                                   "deadlines": {"total": args.latency / 2}}, 60)
+        elapsed = time.perf_counter() - start
+        after = settle(stub, args)
+        results["deadline"] = (answered(before, after), after["abandoned"] - before["abandoned"],
+                               status, elapsed)
+
+        with urllib.request.urlopen(f"{base_url}/api/metrics", timeout=10) as resp:
+            results["metrics"] = json.loads(resp.read()).get("upstream")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    proc, base_url = start_server(stub, root, rate_limit=args.low_rate_limit)
+    try:
+        before = dict(stub.stats)
+        in_parallel([lambda: search(base_url, {"query": fresh_query(), "max_results": 200}, args.give_up)
+                     for _ in range(args.clients)])
+        start = time.perf_counter()
+        status = search(base_url, {"query": fresh_query(), "max_results": 200}, 120)
+        elapsed = time.perf_counter() - start
+        after = settle(stub, args)
+        results["rate budget"] = (answered(before, after), after["abandoned"] - before["abandoned"],
+                                  status, elapsed)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cancellation benchmark")
+    parser.add_argument("--latency", type=float, default=1.0, help="stub upstream latency (s)")
+    parser.add_argument("--clients", type=int, default=8, help="clients that give up per scenario")
+    parser.add_argument("--give-up", type=float, default=0.3, help="seconds before a client gives up")
+    parser.add_argument("--low-rate-limit", type=float, default=4.0, help="RATE_LIMIT for the rate budget run")
+    parser.add_argument("--server-root", default=ROOT, help="checkout whose pubmed_server.py is run")
+    args = parser.parse_args()
+
+    stub = StubEutils(latency=args.latency).start()
+    try:
+        results = run_scenarios(stub, args, os.path.abspath(args.server_root))
+    finally:
+        stub.stop()
+
+    answered_calls, abandoned = results["abandoned"]
+    print(f"abandoned    {args.clients} searches given up after {args.give_up}s: "
+          f"{answered_calls} upstream calls answered afterwards, {abandoned} dropped by the stub")
+    answered_calls, abandoned, status, elapsed = results["rate budget"]
+    print(f"rate budget  RATE_LIMIT={args.low_rate_limit}: next search took {elapsed:.1f}s (HTTP {status}); "
+          f"{answered_calls} upstream calls answered, {abandoned} dropped")
+    answered_calls, abandoned, status = results["coalesced"]
+    print(f"coalesced    2 of 3 identical searches given up: remaining client got HTTP {status}; "
+          f"{answered_calls} upstream calls answered, {abandoned} dropped")
+    answered_calls, abandoned, status, elapsed = results["deadline"]
+    print(f"deadline     total={args.latency / 2}s: HTTP {status} after {elapsed:.2f}s; "
+          f"{answered_calls} upstream calls answered, {abandoned} dropped")
+    if results["metrics"]:
+        print(f"\nserver upstream counters: {results['metrics']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
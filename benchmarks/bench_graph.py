@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark 2-hop link graph expansion with batched elink calls
+
+Expands the "similar articles" graph from 100 seed PMIDs against the stub
+E-utilities server and compares the number of elink requests with the
+one-request-per-PMID approach. A second expansion shows the on-disk graph
+cache answering without upstream calls.
+
+Usage: python benchmarks/bench_graph.py [--seeds 100] [--hops 2]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_eutils import StubEutils
+from pubmed_cache import SharedCache
+from pubmed_client import PubMedClient
+
+
+async def expand(stub, cache, seeds, hops):
+    async with PubMedClient(base_url=stub.url, cache=cache) as client:
+        before = stub.stats["elink"]
+        start = time.perf_counter()
+        graph = await client.expand_graph(seeds, hops=hops)
+        return graph, stub.stats["elink"] - before, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="batched elink graph expansion benchmark")
+    parser.add_argument("--seeds", type=int, default=100)
+    parser.add_argument("--hops", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub upstream latency (s)")
+    args = parser.parse_args()
+
+    stub = StubEutils(latency=args.latency).start()
+    cache = SharedCache(os.path.join(tempfile.mkdtemp(), "graph.sqlite3"))
+    seeds = [str(1000000 + i * 1009) for i in range(args.seeds)]
+
+    graph, calls, elapsed = asyncio.run(expand(stub, cache, seeds, args.hops))
+    expanded = len(graph["edges"])
+    print(f"nodes: {len(graph['nodes'])}, expanded: {expanded}, "
+          f"edges: {sum(len(n) for n in graph['edges'].values())}")
+    print(f"cold:  {calls} elink requests in {elapsed:.2f} s "
+          f"(one per PMID would be {expanded}, ~{expanded * args.latency:.1f} s of upstream latency)")
+
+    graph, calls, elapsed = asyncio.run(expand(stub, cache, seeds, args.hops))
+    print(f"warm:  {calls} elink requests in {elapsed:.2f} s (graph cache)")
+
+    db_size = os.path.getsize(cache.path) + os.path.getsize(cache.path + "-wal")
+    print(f"graph cache on disk: {db_size / 1024:.0f} KiB")
+    stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
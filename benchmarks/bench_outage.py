@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+NCBI outage scenario: circuit breaker, stale-while-revalidate and deadlines
+
+Runs pubmed_server in-process against the stub E-utilities server, warms a
+few queries, then makes the stub slow and failing. Shows that cached queries
+keep being served (stale, with X-Cache/Age headers), uncached queries time
+out at the esearch deadline until the breaker opens and then fail fast with
+503, and that everything recovers once the stub is healthy again.
+
+Usage: python benchmarks/bench_outage.py
+"""
+
+import os
+import sys
+import time
+import tempfile
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_eutils import StubEutils
+
+
+def control(stub, **params):
+    query = "&".join(f"{k}={v}" for k, v in params.items())
+    urllib.request.urlopen(f"{stub.url}/control?{query}").read()
+
+
+def timed(client, query, **extra):
+    start = time.perf_counter()
+    resp = client.post("/api/search", json=dict({"query": query, "max_results": 10}, **extra))
+    return resp, (time.perf_counter() - start) * 1000
+
+
+def show(label, resp, ms):
+    print(f"  {label:<28} {resp.status_code}  {ms:8.1f} ms  "
+          f"X-Cache={resp.headers.get('X-Cache', '-'):<6} Age={resp.headers.get('Age', '-'):<4} "
+          f"Retry-After={resp.headers.get('Retry-After', '-')}")
+
+
+def main():
+    stub = StubEutils(latency=0.01).start()
+    tmp = tempfile.mkdtemp()
+    os.environ.update({
+        "PUBMED_BASE_URL": stub.url,
+        "CACHE_PATH": os.path.join(tmp, "cache.sqlite3"),
+        "CACHE_TTL": "1",
+        "RATE_LIMIT": "100",
+        "BREAKER_FAILURES": "3",
+        "BREAKER_RESET": "3",
+        "ESEARCH_DEADLINE": "1",
+        "EFETCH_DEADLINE": "2",
+    })
+    import pubmed_server
+    client = pubmed_server.app.test_client()
+
+    print("1. healthy upstream, warming cache")
+    for i in range(3):
+        show(f"cached-{i} (miss)", *timed(client, f"cached {i}"))
+    time.sleep(1.2)
+
+    print("2. upstream slow (5 s) and failing, cache entries stale")
+    control(stub, latency=5, fail_rate=1)
+    show("per-request deadline 0.2 s", *timed(client, "uncached x", deadlines={"esearch": 0.2}))
+    for i in range(3):
+        show(f"cached-{i} (stale)", *timed(client, f"cached {i}"))
+    for i in range(5):
+        show(f"uncached-{i}", *timed(client, f"uncached {i}"))
+
+    print("3. upstream healthy again, waiting for the breaker reset")
+    control(stub, latency=0.01, fail_rate=0)
+    time.sleep(3.2)
+    show("uncached-0 (probe)", *timed(client, "uncached 0"))
+    show("cached-0 (stale, refreshing)", *timed(client, "cached 0"))
+    time.sleep(0.5)
+    show("cached-0 (refreshed)", *timed(client, "cached 0"))
+
+    stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
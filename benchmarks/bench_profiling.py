@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Overhead of the request profiling hooks
+
+Serves cached /api/search requests through the Flask test client (no
+network, so per-request overhead is not hidden by I/O) with the profiler:
+
+  disabled     no token, no slow-request threshold (the default)
+  token        a token configured, requests without it
+  sampled 1%   slow-request threshold with 1% sampling
+  every req    every request carries the token and is profiled
+
+Before measuring, it checks that a profiled uncached search captures the
+upstream work: the profile of a 200-result search must include the
+parsing of the efetch response (_process_xml_response).
+
+Usage: python benchmarks/bench_profiling.py [--requests 500] [--rounds 8]
+"""
+
+import os
+import sys
+import time
+import pstats
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_eutils import StubEutils
+
+
+def check_profile_contents(pubmed_server, profiler):
+    """Profile one uncached search and check that the efetch parsing is in it"""
+    pubmed_server.profiler = profiler
+    client = pubmed_server.app.test_client()
+    response = client.post("/api/search", json={"query": "profiling contents", "max_results": 200},
+                           headers={"X-Profile-Token": "secret"})
+    assert response.status_code == 200, response.status_code
+    path = profiler.path(response.headers["X-Profile"])
+    functions = {name for _, _, name in pstats.Stats(path).stats}
+    assert "_process_xml_response" in functions, "profile does not include _process_xml_response"
+    print("profiled uncached search includes _process_xml_response\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profiling hook overhead benchmark")
+    parser.add_argument("--requests", type=int, default=500, help="requests per case and round")
+    parser.add_argument("--rounds", type=int, default=8)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    stub = StubEutils().start()
+    os.environ.update(PUBMED_BASE_URL=stub.url, CACHE_PATH=os.path.join(tmp, "cache.sqlite3"),
+                      WARMUP_ENABLED="False", ADMISSION_ENABLED="False")
+    import pubmed_server
+    from profiling import RequestProfiler
+
+    profile_dir = os.path.join(tmp, "profiles")
+    check_profile_contents(pubmed_server, RequestProfiler(profile_dir, token="secret"))
+
+    client = pubmed_server.app.test_client()
+    payload = {"query": "profiling overhead", "max_results": 10}
+    client.post("/api/search", json=payload)
+
+    cases = [
+        ("disabled", RequestProfiler(profile_dir), {}),
+        ("token", RequestProfiler(profile_dir, token="secret"), {}),
+        ("sampled 1%", RequestProfiler(profile_dir, slow_threshold=1.0, sample_rate=0.01), {}),
+        ("every req", RequestProfiler(profile_dir, token="secret", keep=10), {"X-Profile-Token": "secret"}),
+    ]
+
+    # Interleave the cases in rounds so slow drift over the run (e.g. cache
+    # file growth) affects them all alike, and keep the best round
+    best = {name: float("inf") for name, _, _ in cases}
+    for _ in range(args.rounds):
+        for name, profiler, headers in cases:
+            pubmed_server.profiler = profiler
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                client.post("/api/search", json=payload, headers=headers)
+            best[name] = min(best[name], time.perf_counter() - start)
+
+    print(f"{'profiler':<12} {'req/s':>8} {'us/req':>8} {'overhead':>9}")
+    baseline = None
+    for name, _, _ in cases:
+        per_request = best[name] / args.requests
+        baseline = baseline or per_request
+        print(f"{name:<12} {1 / per_request:>8.0f} {per_request * 1e6:>8.0f} "
+              f"{(per_request / baseline - 1) * 100:>8.1f}%")
+
+    stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
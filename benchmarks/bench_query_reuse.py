@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Upstream calls saved by reusing cached results across search variants
+
+Replays a query log through PubMedClient against the stub E-utilities
+server twice, each time with an empty cache:
+
+  exact key   a search is only served from the cache when the same query,
+              max_results, sort and since_year were cached before
+  reuse       cached results also answer smaller max_results (as a prefix)
+              and narrower since_year (filtered on publication year)
+
+and reports the upstream calls of each run, plus whether both runs
+returned the same PMIDs for every search (the stub honors the since-year
+filter, so the comparison checks the reused results).
+
+The log is the query log of a server cache (--log .cache/pubmed.sqlite3;
+it keeps counts, not order, so each search is repeated `count` times in a
+shuffled order), a JSONL file with one search's parameters per line
+({"query": ..., "max_results": ..., "sort": ...}), or by default a
+synthetic log in which users vary max_results, sort and since_year.
+
+Usage: python benchmarks/bench_query_reuse.py [--log PATH] [--searches 2000]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_eutils import StubEutils
+from pubmed_client import PubMedClient
+from pubmed_cache import SharedCache
+from pubmed_format import build_query
+
+
+def synthetic_log(searches, topics, seed):
+    """Searches over Zipf-distributed topics with the variations users make"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(topics)]
+    log = []
+    for _ in range(searches):
+        topic = rng.choices(range(topics), weights)[0]
+        since_year = rng.choices([None, 2015, 2020, 2023], [5, 2, 2, 1])[0]
+        log.append({
+            "query": build_query(f"topic {topic} therapy", since_year),
+            "max_results": rng.choices([10, 20, 50, 100], [5, 3, 2, 1])[0],
+            "sort": rng.choices(["relevance", "date"], [4, 1])[0],
+        })
+    return log
+
+
+def read_log(path, seed):
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT params, count FROM query_log").fetchall()
+    conn.close()
+    log = [json.loads(params) for params, count in rows for _ in range(count)]
+    random.Random(seed).shuffle(log)
+    return log
+
+
+async def replay(stub, log, reuse):
+    cache = SharedCache(os.path.join(tempfile.mkdtemp(), "cache.sqlite3"))
+    client = PubMedClient(base_url=stub.url, cache=cache, reuse_results=reuse)
+    before = dict(stub.stats)
+    results = []
+    counts = {"hit": 0, "stale": 0, "miss": 0, "prefix": 0, "since_year": 0}
+    start = time.perf_counter()
+    try:
+        for params in log:
+            articles, status = await client.search_with_status(
+                query=params["query"], max_results=int(params.get("max_results", 10)),
+                sort=params.get("sort", "relevance"), date_range=params.get("date_range"))
+            counts[status["cache"]] += 1
+            if "reused" in status:
+                counts[status["reused"]] += 1
+            results.append([a["pmid"] for a in articles])
+    finally:
+        await client.close()
+    elapsed = time.perf_counter() - start
+    calls = {name: stub.stats[name] - before[name] for name in ("esearch", "efetch")}
+    return results, counts, calls, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Result reuse replay benchmark")
+    parser.add_argument("--log", help="server cache file (query_log table) or JSONL of search parameters")
+    parser.add_argument("--searches", type=int, default=2000, help="length of the synthetic log")
+    parser.add_argument("--topics", type=int, default=200, help="distinct topics in the synthetic log")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    log = read_log(args.log, args.seed) if args.log else synthetic_log(args.searches, args.topics, args.seed)
+    distinct = len({json.dumps(params, sort_keys=True) for params in log})
+    stub = StubEutils().start()
+    try:
+        exact = asyncio.run(replay(stub, log, reuse=False))
+        reuse = asyncio.run(replay(stub, log, reuse=True))
+    finally:
+        stub.stop()
+
+    mismatches = sum(a != b for a, b in zip(exact[0], reuse[0]))
+    print(f"{len(log)} searches, {distinct} distinct parameter sets\n")
+    print(f"{'mode':<10} {'esearch':>8} {'efetch':>7} {'upstream':>9} {'hits':>6} {'reused':>7} {'seconds':>8}")
+    for name, (_, counts, calls, elapsed) in (("exact key", exact), ("reuse", reuse)):
+        hits = counts["hit"] + counts["stale"]
+        print(f"{name:<10} {calls['esearch']:>8} {calls['efetch']:>7} {sum(calls.values()):>9} "
+              f"{hits:>6} {counts['prefix'] + counts['since_year']:>7} {elapsed:>8.1f}")
+    saved = sum(exact[2].values()) - sum(reuse[2].values())
+    print(f"\nreused as prefix: {reuse[1]['prefix']}, filtered by year: {reuse[1]['since_year']}")
+    print(f"upstream calls eliminated: {saved} ({saved / max(1, sum(exact[2].values())):.0%})")
+    print(f"searches whose PMIDs differ between the runs: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
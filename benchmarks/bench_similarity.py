@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark near-duplicate grouping on a large synthetic result set
+
+Generates articles with a known fraction of near-duplicates (errata,
+preprint/journal pairs with small edits) and reports the time spent on
+MinHash signatures and LSH clustering, plus how many planted duplicates
+were grouped.
+
+Usage: python benchmarks/bench_similarity.py [--articles 50000] [--dup-rate 0.1]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pubmed_similarity import minhash_signatures, cluster_signatures, group_similar
+
+VOCAB = [f"term{i}" for i in range(20000)]
+
+
+def make_articles(count, dup_rate, seed=7):
+    rng = random.Random(seed)
+    articles = []
+    originals = int(count * (1 - dup_rate))
+    for i in range(originals):
+        title = " ".join(rng.choices(VOCAB, k=12))
+        abstract = " ".join(rng.choices(VOCAB, k=200))
+        articles.append({"pmid": str(i), "title": title, "abstract": abstract})
+
+    planted = {}
+    for i in range(originals, count):
+        source = rng.randrange(originals)
+        words = articles[source]["abstract"].split()
+        # A handful of word edits, like a preprint vs. its journal version
+        for _ in range(5):
+            words[rng.randrange(len(words))] = rng.choice(VOCAB)
+        articles.append({"pmid": str(i), "title": "Erratum: " + articles[source]["title"],
+                         "abstract": " ".join(words)})
+        planted[i] = source
+    return articles, planted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="near-duplicate grouping benchmark")
+    parser.add_argument("--articles", type=int, default=50000)
+    parser.add_argument("--dup-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    articles, planted = make_articles(args.articles, args.dup_rate)
+    texts = [f"{a['title']} {a['abstract']}" for a in articles]
+
+    start = time.perf_counter()
+    signatures = minhash_signatures(texts)
+    signed = time.perf_counter()
+    clusters = cluster_signatures(signatures)
+    clustered = time.perf_counter()
+
+    cluster_of = {}
+    for n, members in enumerate(clusters):
+        for i in members:
+            cluster_of[i] = n
+    found = sum(1 for dup, source in planted.items() if cluster_of[dup] == cluster_of[source])
+
+    start_full = time.perf_counter()
+    grouped = group_similar(articles)
+    full = time.perf_counter() - start_full
+
+    print(f"articles:            {len(articles)}")
+    print(f"minhash signatures:  {signed - start:.2f} s")
+    print(f"lsh clustering:      {clustered - signed:.2f} s")
+    print(f"group_similar total: {full:.2f} s")
+    print(f"clusters:            {len(clusters)} ({len(grouped)} representatives)")
+    print(f"planted duplicates:  {found}/{len(planted)} grouped with their source")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
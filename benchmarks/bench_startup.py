@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Server start-up time
+
+Measures, over several runs:
+
+  import       wall time of `import pubmed_server` in a fresh interpreter,
+               minus the time of an empty interpreter, and the slowest
+               top-level imports from `python -X importtime`
+  healthz      time from launching `python pubmed_server.py` until
+               /healthz answers
+  readyz       until /readyz answers 200
+  first search latency of the first /api/search (stub upstream, cache miss)
+
+Polls every 10 ms. For comparison, the launcher used to sleep 1 s between
+checks, so it noticed a ready server only at the next whole second.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--debug]
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_eutils import StubEutils
+from load_test_workers import free_port
+
+
+def server_env(stub, debug, port=None):
+    return dict(os.environ, HOST="127.0.0.1", PORT=str(port or 0),
+                DEBUG="True" if debug else "False", PUBMED_BASE_URL=stub.url,
+                CACHE_PATH=os.path.join(tempfile.mkdtemp(), "cache.sqlite3"))
+
+
+def time_command(args, env, runs):
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=ROOT, env=env, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def slowest_imports(env, count=6):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import pubmed_server"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    top_level = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        # Direct imports of the server module are indented by three spaces
+        if len(parts) == 3 and parts[2].startswith("   ") and not parts[2].startswith("    "):
+            top_level.append((int(parts[1]), parts[2].strip()))
+    return sorted(top_level, reverse=True)[:count]
+
+
+def poll(url, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return time.perf_counter()
+        except Exception:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{url} did not answer")
+
+
+def start_and_measure(stub, debug):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "pubmed_server.py"], cwd=ROOT,
+                            env=server_env(stub, debug, port),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        healthy = poll(base_url + "/healthz", start + 30) - start
+        ready = poll(base_url + "/readyz", start + 30) - start
+        request = urllib.request.Request(
+            base_url + "/api/search", data=json.dumps({"query": "startup", "max_results": 10}).encode(),
+            headers={"Content-Type": "application/json"})
+        first = time.perf_counter()
+        urllib.request.urlopen(request, timeout=30).read()
+        first_search = time.perf_counter() - first
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return healthy, ready, first_search
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start-up time benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--debug", action="store_true", help="run with DEBUG=True (Flask reloader)")
+    args = parser.parse_args()
+
+    stub = StubEutils().start()
+    env = server_env(stub, args.debug)
+
+    interpreter = time_command([sys.executable, "-c", "pass"], env, args.runs)
+    total = time_command([sys.executable, "-c", "import pubmed_server"], env, args.runs)
+    print(f"import pubmed_server: {(total - interpreter) * 1000:.0f} ms "
+          f"(interpreter start {interpreter * 1000:.0f} ms)")
+    for micros, name in slowest_imports(env):
+        print(f"  {name:<20} {micros / 1000:>6.1f} ms")
+
+    runs = [start_and_measure(stub, args.debug) for _ in range(args.runs)]
+    print(f"\n{'run':>3} {'healthz ms':>11} {'readyz ms':>10} {'first search ms':>16} {'old launcher s':>15}")
+    for i, (healthy, ready, first_search) in enumerate(runs, 1):
+        print(f"{i:>3} {healthy * 1000:>11.0f} {ready * 1000:>10.0f} {first_search * 1000:>16.0f} "
+              f"{math.ceil(ready):>15}")
+
+    stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
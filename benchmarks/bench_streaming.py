@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Time to first result: blocking vs. progressive /search
+
+Runs pubmed_server against the stub E-utilities server and submits the web
+form for several result sizes, each with a query that is not cached yet:
+
+  blocking     POST /search without `progressive`; the first article is
+               visible only when the whole page has arrived
+  progressive  POST /search with `progressive`, then read the SSE stream;
+               reports when the page shell arrived, when the first page
+               of articles arrived, and when the stream finished
+
+Usage: python benchmarks/bench_streaming.py [--sizes 20,100,500,1000]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import tempfile
+import subprocess
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_eutils import StubEutils
+from load_test_workers import free_port, wait_for
+
+_counter = itertools.count()
+
+
+def submit(base_url, max_results, progressive):
+    form = {"query": f"streaming {next(_counter)}", "max_results": max_results, "format": "json"}
+    if progressive:
+        form["progressive"] = "true"
+    with urllib.request.urlopen(f"{base_url}/search", data=urllib.parse.urlencode(form).encode(),
+                                timeout=300) as resp:
+        return resp.read().decode("utf-8"), form
+
+
+def blocking(base_url, max_results):
+    start = time.perf_counter()
+    page, _ = submit(base_url, max_results, progressive=False)
+    total = time.perf_counter() - start
+    return {"first": total, "total": total, "bytes": len(page),
+            "articles": page.count('class="article"')}
+
+
+def progressive(base_url, max_results):
+    start = time.perf_counter()
+    page, form = submit(base_url, max_results, progressive=True)
+    shell = time.perf_counter() - start
+    params = urllib.parse.urlencode({"query": form["query"], "max_results": max_results})
+
+    first = None
+    articles = 0
+    first_bytes = 0
+    server_timing = {}
+    event = None
+    with urllib.request.urlopen(f"{base_url}/search/stream?{params}", timeout=300) as resp:
+        for raw in resp:
+            line = raw.decode("utf-8").rstrip("\n")
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                data = json.loads(line[6:])
+                if event == "page":
+                    if first is None:
+                        first = time.perf_counter() - start
+                        first_bytes = len(page) + len(line)
+                    articles += data["html"].count('class="article"')
+                elif event == "done":
+                    server_timing = data
+                    break
+    return {"shell": shell, "first": first or 0.0, "total": time.perf_counter() - start,
+            "bytes": first_bytes, "articles": articles, "server": server_timing}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Progressive results benchmark")
+    parser.add_argument("--sizes", default="20,100,500,1000")
+    parser.add_argument("--latency", type=float, default=0.1, help="stub upstream latency (s)")
+    parser.add_argument("--rate-limit", type=float, default=10.0)
+    args = parser.parse_args()
+
+    stub = StubEutils(latency=args.latency).start()
+    port = free_port()
+    env = dict(os.environ, HOST="127.0.0.1", PORT=str(port), DEBUG="False",
+               PUBMED_BASE_URL=stub.url, RATE_LIMIT=str(args.rate_limit),
+               CACHE_PATH=os.path.join(tempfile.mkdtemp(), "cache.sqlite3"))
+    proc = subprocess.Popen([sys.executable, "pubmed_server.py"], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        if not wait_for(base_url + "/healthz"):
+            print("server failed to start")
+            return 1
+
+        print(f"{'results':>7} {'mode':<12} {'shell ms':>9} {'first ms':>9} {'total ms':>9} "
+              f"{'KiB before 1st':>15} {'articles':>9}")
+        for size in [int(s) for s in args.sizes.split(",")]:
+            b = blocking(base_url, size)
+            p = progressive(base_url, size)
+            print(f"{size:>7} {'blocking':<12} {'-':>9} {b['first'] * 1000:>9.0f} "
+                  f"{b['total'] * 1000:>9.0f} {b['bytes'] / 1024:>15.0f} {b['articles']:>9}")
+            print(f"{size:>7} {'progressive':<12} {p['shell'] * 1000:>9.0f} {p['first'] * 1000:>9.0f} "
+                  f"{p['total'] * 1000:>9.0f} {p['bytes'] / 1024:>15.0f} {p['articles']:>9}"
+                  f"   (server: first {p['server'].get('first_result_ms')} ms, "
+                  f"total {p['server'].get('total_ms')} ms)")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Cold start vs. warm start after a deployment
+
+First builds a query history: pubmed_server runs a skewed (Zipf-like)
+search workload against the stub E-utilities server and is stopped with
+SIGTERM, which writes the cache snapshot. Then two fresh deployments, each
+with an empty cache, run the same workload:
+
+  cold  no snapshot
+  warm  restores the snapshot and re-runs frequent searches in the background
+
+Reports time until the server answers, the cache hit rate (X-Cache HIT or
+STALE) per time window after boot, upstream calls, and the warm-up progress
+from /api/metrics.
+
+Usage: python benchmarks/bench_warmup.py [--duration 20] [--window 5]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import signal
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_eutils import StubEutils
+from load_test_workers import free_port, wait_for
+
+
+def search(base_url, query):
+    req = urllib.request.Request(f"{base_url}/api/search",
+                                 data=json.dumps({"query": query, "max_results": 10}).encode(),
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        resp.read()
+        return resp.headers.get("X-Cache", "MISS")
+
+
+def run_workload(base_url, queries, concurrency, duration, seed):
+    """Return (seconds since start, X-Cache) for every request"""
+    weights = [1.0 / (i + 1) for i in range(len(queries))]
+    started = time.time()
+    deadline = started + duration
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        events = []
+        while time.time() < deadline:
+            query = rng.choices(queries, weights)[0]
+            try:
+                events.append((time.time() - started, search(base_url, query)))
+            except Exception:
+                events.append((time.time() - started, "ERROR"))
+        return events
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return [e for events in pool.map(worker, range(concurrency)) for e in events]
+
+
+def start_server(stub, args, cache_dir, snapshot_path):
+    port = free_port()
+    env = dict(os.environ, HOST="127.0.0.1", PORT=str(port), DEBUG="False",
+               PUBMED_BASE_URL=stub.url, RATE_LIMIT=str(args.rate_limit),
+               CACHE_PATH=os.path.join(cache_dir, "cache.sqlite3"),
+               CACHE_TTL=str(args.ttl), SNAPSHOT_PATH=snapshot_path,
+               WARMUP_TOP_N=str(args.warmup_top_n))
+    started = time.time()
+    proc = subprocess.Popen([sys.executable, "pubmed_server.py"], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    if not wait_for(base_url + "/api/metrics"):
+        proc.kill()
+        raise RuntimeError("server failed to start")
+    return proc, base_url, time.time() - started
+
+
+def stop_server(proc):
+    proc.send_signal(signal.SIGTERM)
+    proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache warm-up benchmark")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per measured run")
+    parser.add_argument("--history", type=float, default=30.0, help="seconds of history before the snapshot")
+    parser.add_argument("--window", type=float, default=5.0)
+    parser.add_argument("--queries", type=int, default=300, help="number of distinct queries")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate-limit", type=float, default=10.0)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub upstream latency (s)")
+    parser.add_argument("--ttl", type=float, default=3600, help="CACHE_TTL; small values make restored entries stale")
+    parser.add_argument("--warmup-top-n", type=int, default=100)
+    args = parser.parse_args()
+
+    stub = StubEutils(latency=args.latency).start()
+    queries = [f"topic {i} outcome" for i in range(args.queries)]
+    snapshot_path = os.path.join(tempfile.mkdtemp(), "snapshot.json.gz")
+
+    proc, base_url, _ = start_server(stub, args, tempfile.mkdtemp(), snapshot_path)
+    try:
+        run_workload(base_url, queries, args.concurrency, args.history, seed=0)
+    finally:
+        stop_server(proc)
+    print(f"history: {args.history:.0f}s of traffic, snapshot {os.path.getsize(snapshot_path) / 1024:.0f} KiB")
+
+    results = {}
+    for name, snapshot in (("cold", ""), ("warm", snapshot_path)):
+        upstream_before = stub.upstream_calls()
+        proc, base_url, ready = start_server(stub, args, tempfile.mkdtemp(), snapshot)
+        try:
+            events = run_workload(base_url, queries, args.concurrency, args.duration, seed=1)
+            with urllib.request.urlopen(base_url + "/api/metrics") as resp:
+                warmup = json.load(resp)["warmup"]
+        finally:
+            stop_server(proc)
+        results[name] = (ready, events, stub.upstream_calls() - upstream_before, warmup)
+
+    windows = int(args.duration // args.window)
+    header = "".join(f"{f'{i * args.window:.0f}-{(i + 1) * args.window:.0f}s':>9}" for i in range(windows))
+    print(f"\n{'run':<5} {'ready s':>8} {'requests':>9} {'upstream':>9}  hit rate per window:{header}")
+    for name, (ready, events, upstream, _) in results.items():
+        rates = []
+        for i in range(windows):
+            window = [c for t, c in events if i * args.window <= t < (i + 1) * args.window]
+            hits = sum(1 for c in window if c in ("HIT", "STALE"))
+            rates.append(f"{hits / len(window):>9.0%}" if window else f"{'-':>9}")
+        print(f"{name:<5} {ready:>8.2f} {len(events):>9} {upstream:>9}  {'':20}{''.join(rates)}")
+
+    warmup = results["warm"][3]
+    print(f"\nwarm-up: state={warmup['state']} restored={warmup['restored_queries']} searches/"
+          f"{warmup['restored_articles']} articles, re-run {warmup['warmed']} of {warmup['total']} "
+          f"({warmup['fresh']} still fresh, {warmup['failed']} failed)")
+
+    stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Interactive vs. batch load test for admission control
+
+Runs pubmed_server against the stub E-utilities server twice, with
+admission control disabled and enabled. In each run, simulated browser
+users submit /search forms with think time, first alone and then while
+several batch clients saturate the NCBI rate budget with /api/search calls.
+Every query is unique, so each request needs upstream calls.
+
+Reports interactive p50/p99 latency, batch throughput, how many requests
+were shed with 429, and the server's queue metrics. With --gunicorn N the
+server runs under `gunicorn -c gunicorn.conf.py` with N workers instead of
+the development server; admission limits then apply per worker.
+
+Usage: python benchmarks/load_test_priority.py [--duration 15] [--gunicorn 2]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import itertools
+import subprocess
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_eutils import StubEutils
+from load_test_workers import free_port, wait_for, percentile
+
+_counter = itertools.count()
+
+
+def interactive_user(base_url, deadline, think_time):
+    latencies = []
+    while time.time() < deadline:
+        body = urllib.parse.urlencode({"query": f"interactive {next(_counter)}",
+                                       "max_results": 10}).encode()
+        start = time.perf_counter()
+        try:
+            urllib.request.urlopen(f"{base_url}/search", data=body, timeout=120).read()
+            latencies.append(time.perf_counter() - start)
+        except urllib.error.HTTPError:
+            pass
+        time.sleep(random.uniform(0.5, 1.5) * think_time)
+    return latencies
+
+
+def batch_client(base_url, deadline, client_id):
+    done = shed = 0
+    while time.time() < deadline:
+        req = urllib.request.Request(
+            f"{base_url}/api/search",
+            data=json.dumps({"query": f"batch {next(_counter)}", "max_results": 10}).encode(),
+            headers={"Content-Type": "application/json", "X-Client-Id": client_id})
+        try:
+            urllib.request.urlopen(req, timeout=120).read()
+            done += 1
+        except urllib.error.HTTPError as e:
+            if e.code == 429:
+                shed += 1
+                time.sleep(float(e.headers.get("Retry-After", 1)))
+    return done, shed
+
+
+def run(args, stub, admission):
+    port = free_port()
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ, HOST="127.0.0.1", PORT=str(port), DEBUG="False",
+               PUBMED_BASE_URL=stub.url, RATE_LIMIT=str(args.rate_limit),
+               CACHE_PATH=os.path.join(tmp, "cache.sqlite3"), WARMUP_ENABLED="False",
+               CLIENT_ID_HEADER="X-Client-Id", ADMISSION_ENABLED="True" if admission else "False")
+    if args.gunicorn:
+        env["WORKERS"] = str(args.gunicorn)
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "pubmed_server:app"]
+    else:
+        command = [sys.executable, "pubmed_server.py"]
+    proc = subprocess.Popen(command, cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_for(base_url + "/api/metrics")
+        results = {}
+        with ThreadPoolExecutor(args.users + args.batch_clients * args.batch_threads) as pool:
+            deadline = time.time() + args.duration
+            users = [pool.submit(interactive_user, base_url, deadline, args.think_time)
+                     for _ in range(args.users)]
+            results["alone"] = [l for f in users for l in f.result()]
+
+            deadline = time.time() + args.duration
+            batches = [pool.submit(batch_client, base_url, deadline, f"batch-{c}")
+                       for c in range(args.batch_clients) for _ in range(args.batch_threads)]
+            users = [pool.submit(interactive_user, base_url, deadline, args.think_time)
+                     for _ in range(args.users)]
+            results["loaded"] = [l for f in users for l in f.result()]
+            results["batch"] = [f.result() for f in batches]
+
+        with urllib.request.urlopen(base_url + "/api/metrics") as resp:
+            results["metrics"] = json.loads(resp.read())
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="admission control load test")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per phase")
+    parser.add_argument("--users", type=int, default=2, help="interactive users")
+    parser.add_argument("--think-time", type=float, default=1.0)
+    parser.add_argument("--batch-clients", type=int, default=4)
+    parser.add_argument("--batch-threads", type=int, default=4, help="threads per batch client")
+    parser.add_argument("--rate-limit", type=float, default=10.0)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub upstream latency (s)")
+    parser.add_argument("--gunicorn", type=int, default=0, metavar="WORKERS",
+                        help="run the server under gunicorn with this many workers")
+    args = parser.parse_args()
+
+    stub = StubEutils(latency=args.latency).start()
+    for admission in (False, True):
+        r = run(args, stub, admission)
+        done = sum(d for d, _ in r["batch"])
+        shed = sum(s for _, s in r["batch"])
+        print(f"admission control {'on' if admission else 'off'}:")
+        for phase in ("alone", "loaded"):
+            lat = r[phase]
+            print(f"  interactive {phase:<7} n={len(lat):<4} p50={percentile(lat, 50) * 1000:7.0f} ms "
+                  f"p99={percentile(lat, 99) * 1000:7.0f} ms")
+        print(f"  batch: {done / args.duration:.1f} req/s completed, {shed} shed with 429")
+        if admission:
+            print("  queue metrics (one worker):" if args.gunicorn else "  queue metrics:", json.dumps(r["metrics"]["admission"]["classes"], indent=2))
+    stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
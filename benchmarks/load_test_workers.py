@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Multi-worker load test for pubmed_server under gunicorn
+
+Starts the stub E-utilities server, then for each worker count launches
+`gunicorn -c gunicorn.conf.py pubmed_server:app` against a fresh shared cache
+and drives it with concurrent /api/search requests drawn from a skewed query
+mix. Reports throughput per worker count together with the upstream request
+rate, which must stay within RATE_LIMIT no matter how many workers run.
+
+Usage: python benchmarks/load_test_workers.py [--workers 1,2,4,8] [--duration 10]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_eutils import StubEutils
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return True
+        except Exception:
+            time.sleep(0.05)
+    return False
+
+
+def post_json(url, payload):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        resp.read()
+        return resp.status
+
+
+def warm(base_url, queries, concurrency):
+    """Request every query once so the measured phase is served from the shared cache"""
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(lambda q: post_json(f"{base_url}/api/search",
+                                          {"query": q, "max_results": 10}), queries))
+
+
+def run_load(base_url, queries, concurrency, duration):
+    """
+    Send requests from `concurrency` threads for `duration` seconds
+
+    Requests shed with 429 are counted apart from other errors; neither
+    counts towards throughput.
+    """
+    latencies = []
+    errors = shed = 0
+    deadline = time.time() + duration
+    # Zipf-like skew: a few queries are much hotter than the rest
+    weights = [1.0 / (i + 1) for i in range(len(queries))]
+
+    def worker(seed):
+        nonlocal errors, shed
+        rng = random.Random(seed)
+        local = []
+        while time.time() < deadline:
+            query = rng.choices(queries, weights)[0]
+            start = time.perf_counter()
+            try:
+                post_json(f"{base_url}/api/search", {"query": query, "max_results": 10})
+                local.append(time.perf_counter() - start)
+            except urllib.error.HTTPError as e:
+                if e.code == 429:
+                    shed += 1
+                else:
+                    errors += 1
+            except Exception:
+                errors += 1
+        return local
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        for result in pool.map(worker, range(concurrency)):
+            latencies.extend(result)
+    return latencies, errors, shed
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pubmed_server multi-worker load test")
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--queries", type=int, default=50, help="number of distinct queries")
+    parser.add_argument("--rate-limit", type=float, default=10.0, help="shared upstream requests/s")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub upstream latency (s)")
+    parser.add_argument("--cold", action="store_true", help="skip the cache warm-up phase")
+    args = parser.parse_args()
+
+    stub = StubEutils(latency=args.latency).start()
+    queries = [f"topic {i} treatment" for i in range(args.queries)]
+
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'429':>6} {'upstream/s':>11}")
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        port = free_port()
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ,
+                       HOST="127.0.0.1", PORT=str(port), WORKERS=str(workers),
+                       PUBMED_BASE_URL=stub.url, RATE_LIMIT=str(args.rate_limit),
+                       CACHE_PATH=os.path.join(tmp, "cache.sqlite3"),
+                       # All requests come from one IP; this measures worker scaling,
+                       # not admission control (see load_test_priority.py)
+                       ADMISSION_ENABLED="False")
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "pubmed_server:app"],
+                cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                if not wait_for(base_url + "/"):
+                    print(f"{workers:>7} server failed to start")
+                    continue
+
+                if not args.cold:
+                    warm(base_url, queries, args.concurrency)
+
+                upstream_before = stub.upstream_calls()
+                started = time.time()
+                latencies, errors, shed = run_load(base_url, queries, args.concurrency, args.duration)
+                elapsed = time.time() - started
+                upstream = stub.upstream_calls() - upstream_before
+            finally:
+                proc.terminate()
+                proc.wait(timeout=10)
+
+        throughput = len(latencies) / elapsed
+        baseline = baseline or throughput
+        print(f"{workers:>7} {throughput:>9.1f} {percentile(latencies, 50) * 1000:>8.1f} "
+              f"{percentile(latencies, 99) * 1000:>8.1f} {errors:>7} {shed:>6} "
+              f"{upstream / elapsed:>11.2f}   (x{throughput / baseline:.2f})")
+
+    stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
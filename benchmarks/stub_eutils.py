@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the NCBI E-utilities used by the benchmarks
+
+Serves deterministic esearch/efetch/elink responses so load tests never touch the
+real NCBI servers, and can inject latency and failures. Both can be changed
+while running with GET /control?latency=<s>&fail_rate=<0..1>. Requests whose
+client hung up during the injected latency are counted as "abandoned"
+instead of being answered.
+
+Usage: python benchmarks/stub_eutils.py [--port 8900] [--latency 0.05] [--fail-rate 0.0] [--key-rate 10]
+"""
+
+import re
+import sys
+import json
+import time
+import zlib
+import random
+import select
+import socket
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+JOURNALS = ["Nature", "Science", "The Lancet", "BMJ", "JAMA", "Cell", "PLoS One"]
+RESULT_COUNT = 1000
+# Publication-year filter as added for since_year, e.g. "(covid) AND 2020:3000[PDAT]"
+SINCE_YEAR = re.compile(r"^\((.*)\) AND (\d+):3000\[PDAT\]$")
+
+
+def _pmids_for(term, sort):
+    """Deterministic PMID list for a search term, honoring a since-year filter"""
+    since_year = 0
+    match = SINCE_YEAR.match(term)
+    if match:
+        term, since_year = match.group(1), int(match.group(2))
+    base = 1000000 + zlib.crc32(term.encode("utf-8")) % 30000000
+    pmids = [base + i * 7 for i in range(RESULT_COUNT)]
+    pmids = [p for p in pmids if _year(p) >= since_year]
+    if sort == "pub date":
+        pmids.sort(key=lambda p: (-_year(p), p))
+    return [str(p) for p in pmids]
+
+
+def _year(pmid):
+    # Result lists step through PMIDs by 7, so this spreads each list over all years
+    return 1990 + int(pmid) // 7 % 35
+
+
+def _neighbors(pmid, linkname, count=20):
+    """Deterministic neighbor PMIDs drawn from a bounded universe so graphs overlap"""
+    seed = zlib.crc32(f"{linkname}:{pmid}".encode("utf-8"))
+    rng = random.Random(seed)
+    return [str(1000000 + rng.randrange(200000)) for _ in range(count)]
+
+
+def article_xml(pmid):
+    """PubmedArticle XML for one stub PMID"""
+    pmid = int(pmid)
+    return (
+        "<PubmedArticle><MedlineCitation><PMID Version=\"1\">%d</PMID><Article>"
+        "<Journal><Title>%s</Title><JournalIssue><PubDate><Year>%d</Year><Month>Jan</Month>"
+        "</PubDate></JournalIssue></Journal>"
+        "<ArticleTitle>Stub article %d on topic %d</ArticleTitle>"
+        "<Abstract><AbstractText>Abstract for stub article %d about topic %d.</AbstractText></Abstract>"
+        "<AuthorList><Author><LastName>Author%d</LastName><ForeName>A</ForeName></Author>"
+        "<Author><LastName>Author%d</LastName><ForeName>B</ForeName></Author></AuthorList>"
+        "</Article><KeywordList><Keyword>topic%d</Keyword></KeywordList></MedlineCitation>"
+        "<PubmedData><ArticleIdList><ArticleId IdType=\"doi\">10.0000/stub.%d</ArticleId>"
+        "</ArticleIdList></PubmedData></PubmedArticle>"
+    ) % (pmid, JOURNALS[pmid % len(JOURNALS)], _year(pmid), pmid, pmid % 50, pmid,
+         pmid % 50, pmid % 200, pmid % 300, pmid % 50, pmid)
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that give up early (deadlines, cancellation) are expected
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+class StubEutils:
+    """Threaded HTTP server implementing the E-utilities endpoints used by PubMedClient"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fail_rate=0.0, key_rate=None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        # Requests/s allowed per api_key (3/s without a key), None to disable
+        self.key_rate = key_rate
+        self.stats = {"esearch": 0, "efetch": 0, "elink": 0, "failed": 0, "throttled": 0,
+                      "abandoned": 0}
+        self.per_key = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self.server = _QuietServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def allow(self, api_key):
+        """Per-key token bucket, like NCBI's per-key rate limit"""
+        if self.key_rate is None:
+            return True
+        rate = self.key_rate if api_key else 3.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(api_key, (rate, now))
+            tokens = min(rate, tokens + (now - updated) * rate)
+            allowed = tokens >= 1.0
+            self._buckets[api_key] = (tokens - 1.0 if allowed else tokens, now)
+            if allowed:
+                self.per_key[api_key] = self.per_key.get(api_key, 0) + 1
+            else:
+                self.stats["throttled"] += 1
+        return allowed
+
+    def upstream_calls(self):
+        with self._lock:
+            return self.stats["esearch"] + self.stats["efetch"] + self.stats["elink"]
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, content_type="application/json", headers=None):
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _client_gone(self):
+                try:
+                    readable, _, _ = select.select([self.connection], [], [], 0)
+                    return bool(readable) and self.connection.recv(1, socket.MSG_PEEK) == b""
+                except OSError:
+                    return True
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                multi = parse_qs(parsed.query)
+                params = {k: v[0] for k, v in multi.items()}
+                endpoint = parsed.path.rsplit("/", 1)[-1]
+
+                if endpoint == "stats":
+                    with stub._lock:
+                        self._send(200, json.dumps(stub.stats))
+                    return
+                if endpoint == "control":
+                    # Change the injected latency/failure rate while running
+                    stub.latency = float(params.get("latency", stub.latency))
+                    stub.fail_rate = float(params.get("fail_rate", stub.fail_rate))
+                    self._send(200, json.dumps({"latency": stub.latency,
+                                                "fail_rate": stub.fail_rate}))
+                    return
+
+                if stub.latency:
+                    time.sleep(stub.latency)
+                    if self._client_gone():
+                        stub.count("abandoned")
+                        self.close_connection = True
+                        return
+                if not stub.allow(params.get("api_key")):
+                    self._send(429, json.dumps({"error": "API rate limit exceeded"}))
+                    return
+                if stub.fail_rate and random.random() < stub.fail_rate:
+                    stub.count("failed")
+                    self._send(502, "upstream failure")
+                    return
+
+                if endpoint == "esearch.fcgi":
+                    stub.count("esearch")
+                    retmax = int(params.get("retmax", 20))
+                    retstart = int(params.get("retstart", 0))
+                    pmids = _pmids_for(params.get("term", ""), params.get("sort"))
+                    body = {"esearchresult": {
+                        "count": str(len(pmids)),
+                        "retmax": str(retmax),
+                        "retstart": str(retstart),
+                        "idlist": pmids[retstart:retstart + retmax],
+                    }}
+                    self._send(200, json.dumps(body))
+                elif endpoint == "efetch.fcgi":
+                    stub.count("efetch")
+                    ids = [i for i in params.get("id", "").split(",") if i]
+                    xml = "<PubmedArticleSet>%s</PubmedArticleSet>" % "".join(
+                        article_xml(pmid) for pmid in ids)
+                    self._send(200, xml, content_type="text/xml")
+                elif endpoint == "elink.fcgi":
+                    stub.count("elink")
+                    linkname = params.get("linkname", "pubmed_pubmed")
+                    # One link set per repeated id parameter, as E-utilities does
+                    linksets = [{
+                        "dbfrom": "pubmed",
+                        "ids": [pmid],
+                        "linksetdbs": [{"dbto": "pubmed", "linkname": linkname,
+                                        "links": _neighbors(pmid, linkname)}],
+                    } for pmid in multi.get("id", [])]
+                    self._send(200, json.dumps({"linksets": linksets}))
+                else:
+                    self._send(404, json.dumps({"error": "unknown endpoint"}))
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 502")
+    parser.add_argument("--key-rate", type=float, default=None, help="requests/s allowed per API key")
+    args = parser.parse_args()
+
+    stub = StubEutils(args.host, args.port, args.latency, args.fail_rate, args.key_rate)
+    print(f"Stub E-utilities listening on {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import time
+import threading
+from typing import Optional
+
+
+class CircuitOpenError(Exception):
+    """Raised when an upstream call is rejected because the circuit is open"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"PubMed upstream unavailable, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Fail fast on upstream calls after repeated errors
+
+    The circuit opens after ``failure_threshold`` consecutive failures and
+    rejects calls for ``reset_timeout`` seconds. After that a single probe
+    call is let through (half-open): success closes the circuit, failure
+    opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._retry_after() <= 0:
+                return self.HALF_OPEN
+            return self._state
+
+    def _retry_after(self) -> float:
+        return self._opened_at + self.reset_timeout - time.monotonic()
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call should not be attempted"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+
+            retry_after = self._retry_after()
+            if self._state == self.OPEN and retry_after > 0:
+                raise CircuitOpenError(retry_after)
+
+            # Half-open: allow one probe at a time
+            if self._probe_in_flight:
+                raise CircuitOpenError(max(retry_after, 1.0))
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Forget an attempted call that ended without an outcome (e.g. cancelled)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def retry_after(self) -> Optional[float]:
+        """Seconds until the next call is allowed, or None if the circuit is closed"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return None
+            return max(0.0, self._retry_after())
@@ -0,0 +1,34 @@
+"""
+Gunicorn 多工作進程配置
+
+用法: gunicorn -c gunicorn.conf.py pubmed_server:app
+
+所有工作進程透過 CACHE_PATH 指向的 SQLite 檔案共用文章快取、查詢快取
+與 NCBI 速率限制，因此增加工作進程數不會放大對 E-utilities 的請求速率。
+"""
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WORKERS", "4"))
+# 准入控制在每個工作進程內排隊，請求在佇列中等待時佔用一個線程，因此使用線程工作進程，
+# 線程數預設為容量加上兩個佇列的長度
+worker_class = "gthread"
+threads = int(os.getenv("THREADS", str(
+    int(os.getenv("ADMISSION_CAPACITY", "16"))
+    + int(os.getenv("INTERACTIVE_QUEUE", "32"))
+    + int(os.getenv("BATCH_QUEUE", "64")))))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+# 每個工作進程自行導入應用，避免在 fork 前建立的連接被共用
+preload_app = False
+
+
+def worker_exit(server, worker):
+    """工作進程退出時保存快取快照（各進程共用快取，最後寫入者生效）並釋放預熱租約"""
+    import sys
+    app_module = sys.modules.get("pubmed_server")
+    if app_module is not None:
+        app_module.shutdown()
@@ -0,0 +1,146 @@
+import os
+import re
+import hmac
+import json
+import time
+import random
+import pstats
+import cProfile
+import itertools
+import threading
+from io import StringIO
+from typing import Dict, List, Optional, Any
+
+
+class ProfileSession:
+    """A request running under cProfile"""
+
+    def __init__(self, name: str, reason: str):
+        self.name = name
+        self.reason = reason
+        self.started = time.perf_counter()
+        self.profile = cProfile.Profile()
+
+
+class RequestProfiler:
+    """
+    Opt-in cProfile capture for individual requests
+
+    A request is profiled when it carries the profiling token (``explicit``)
+    or, when ``slow_threshold`` is set, for a random ``sample_rate`` share
+    of requests; sampled profiles are only kept if the request took at least
+    ``slow_threshold`` seconds. Profiles are written as pstats files (plus a
+    JSON sidecar with the request details) to ``directory``, keeping the
+    newest ``keep``. Only one request per process is profiled at a time.
+
+    When neither a token nor a threshold is configured, ``enabled`` is False
+    and callers should skip the profiler entirely.
+    """
+
+    def __init__(self, directory: str, token: Optional[str] = None,
+                 slow_threshold: float = 0.0, sample_rate: float = 0.0, keep: int = 100):
+        self.directory = directory
+        self.token = token or None
+        self.slow_threshold = slow_threshold
+        self.sample_rate = sample_rate if slow_threshold > 0 else 0.0
+        self.keep = keep
+        self.enabled = bool(self.token or self.sample_rate)
+        self._busy = threading.Lock()
+        self._counter = itertools.count()
+        self._stats_lock = threading.Lock()
+        self.stats = {"explicit": 0, "sampled": 0, "kept_slow": 0, "busy": 0}
+
+    def authorized(self, supplied: Optional[str]) -> bool:
+        """Check a token supplied by a client"""
+        # Compare bytes: compare_digest rejects str with non-ASCII characters
+        return bool(self.token and supplied) and hmac.compare_digest(
+            supplied.encode("utf-8"), self.token.encode("utf-8"))
+
+    def _count(self, field: str) -> None:
+        with self._stats_lock:
+            self.stats[field] += 1
+
+    def start(self, explicit: bool, label: str) -> Optional[ProfileSession]:
+        """
+        Start profiling the current thread if the request should be profiled
+
+        Returns:
+            The session, or None if the request is not profiled (not
+            sampled, or another request is being profiled)
+        """
+        if not explicit and not (self.sample_rate and random.random() < self.sample_rate):
+            return None
+        if not self._busy.acquire(blocking=False):
+            self._count("busy")
+            return None
+
+        self._count("explicit" if explicit else "sampled")
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")[:60]
+        name = f"{int(time.time() * 1000)}-{os.getpid()}-{next(self._counter)}-{slug}"
+        session = ProfileSession(name, "explicit" if explicit else "slow")
+        session.profile.enable()
+        return session
+
+    def finish(self, session: ProfileSession, details: Dict[str, Any]) -> Optional[str]:
+        """
+        Stop profiling and store the profile if it should be kept
+
+        Returns:
+            The profile name if it was stored
+        """
+        try:
+            session.profile.disable()
+            elapsed = time.perf_counter() - session.started
+            if session.reason == "slow" and elapsed < self.slow_threshold:
+                return None
+            if session.reason == "slow":
+                self._count("kept_slow")
+
+            os.makedirs(self.directory, exist_ok=True)
+            session.profile.dump_stats(os.path.join(self.directory, f"{session.name}.pstats"))
+            with open(os.path.join(self.directory, f"{session.name}.json"), "w") as f:
+                json.dump(dict(details, name=session.name, reason=session.reason,
+                               elapsed_ms=round(elapsed * 1000, 1), created_at=time.time()), f)
+            self._prune()
+            return session.name
+        finally:
+            self._busy.release()
+
+    def _prune(self) -> None:
+        names = sorted(f[:-len(".pstats")] for f in os.listdir(self.directory) if f.endswith(".pstats"))
+        for name in names[:-self.keep] if self.keep else []:
+            for suffix in (".pstats", ".json"):
+                try:
+                    os.remove(os.path.join(self.directory, name + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Details of the stored profiles, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for filename in sorted(os.listdir(self.directory), reverse=True):
+            if filename.endswith(".json"):
+                try:
+                    with open(os.path.join(self.directory, filename)) as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return profiles
+
+    def path(self, name: str) -> Optional[str]:
+        """Path of a stored pstats file, or None if there is no such profile"""
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", name):
+            return None
+        path = os.path.join(self.directory, f"{name}.pstats")
+        return path if os.path.exists(path) else None
+
+    def summary(self, name: str, sort: str = "cumulative", limit: int = 40) -> Optional[str]:
+        """pstats text report of a stored profile"""
+        path = self.path(name)
+        if path is None:
+            return None
+        out = StringIO()
+        pstats.Stats(path, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
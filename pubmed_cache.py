@@ -0,0 +1,640 @@
+import os
+import gzip
+import json
+import math
+import array
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+
+
+class _SQLiteStore:
+    """Base class for stores backed by a SQLite database shared between processes"""
+
+    SCHEMA = ""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Return a connection for the current thread
+
+        Connections are never shared between threads or inherited across
+        fork(), so every gunicorn/uvicorn worker opens its own handle onto
+        the same WAL-mode database file.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Reads are served from the shared page cache mapping instead of
+        # being copied into each process
+        conn.execute("PRAGMA mmap_size=268435456")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+
+class SharedCache(_SQLiteStore):
+    """Article and query cache shared by all server workers"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS articles (
+            pmid TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS articles_fetched_at ON articles (fetched_at);
+        CREATE TABLE IF NOT EXISTS queries (
+            key TEXT PRIMARY KEY,
+            pmids TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS query_variants (
+            key TEXT PRIMARY KEY,
+            family TEXT NOT NULL,
+            since_year INTEGER,
+            max_results INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS query_variants_family ON query_variants (family);
+        CREATE TABLE IF NOT EXISTS links (
+            pmid INTEGER NOT NULL,
+            linkname TEXT NOT NULL,
+            neighbors BLOB NOT NULL,
+            fetched_at REAL NOT NULL,
+            PRIMARY KEY (pmid, linkname)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS query_log (
+            key TEXT PRIMARY KEY,
+            params TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            last_seen REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str, query_ttl: float = 3600.0, max_stale: float = 86400.0,
+                 link_ttl: float = 7 * 86400.0, article_ttl: float = 30 * 86400.0):
+        super().__init__(path)
+        self.query_ttl = query_ttl
+        self.max_stale = max_stale
+        self.link_ttl = link_ttl
+        # Articles are re-fetched after this long, so corrections and
+        # retractions reach the cache; older rows are deleted on write
+        self.article_ttl = article_ttl
+
+    @staticmethod
+    def make_key(**params: Any) -> str:
+        """Build a stable cache key from search parameters"""
+        raw = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get_query(self, key: str) -> Optional[Tuple[List[str], float]]:
+        """
+        Look up the PMID list stored for a query
+
+        Entries older than ``query_ttl`` are still returned for up to
+        ``max_stale`` more seconds so they can be served while being
+        refreshed; use ``is_fresh`` to tell them apart.
+
+        Returns:
+            Tuple of (pmids, created_at), or None if the query is not cached
+            or has expired
+        """
+        row = self._connect().execute(
+            "SELECT pmids, created_at FROM queries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        pmids, created_at = row
+        if time.time() - created_at > self.query_ttl + self.max_stale:
+            return None
+        return json.loads(pmids), created_at
+
+    def is_fresh(self, created_at: float) -> bool:
+        """Whether an entry created at ``created_at`` is within ``query_ttl``"""
+        return time.time() - created_at <= self.query_ttl
+
+    def put_query(self, key: str, pmids: List[str], family: Optional[str] = None,
+                  since_year: Optional[int] = None, max_results: Optional[int] = None) -> None:
+        """
+        Store the PMID list returned by esearch for a query
+
+        Args:
+            family: When given, index the entry under this search family
+                (see SearchQuery.family_key) with its ``since_year`` and
+                ``max_results`` so other variants can reuse it
+        """
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO queries (key, pmids, created_at) VALUES (?, ?, ?)",
+            (key, json.dumps(pmids), time.time())
+        )
+        if family is not None:
+            conn.execute(
+                "INSERT OR REPLACE INTO query_variants (key, family, since_year, max_results) "
+                "VALUES (?, ?, ?, ?)", (key, family, since_year, max_results)
+            )
+
+    def query_variants(self, family: str, since_year: Optional[int]) -> List[Dict[str, Any]]:
+        """
+        Unexpired cached variants of a search family that cover ``since_year``
+
+        Returns:
+            Dicts with "pmids", "created_at", "since_year" (None for no
+            year filter) and "max_results", closest date range first
+        """
+        rows = self._connect().execute(
+            "SELECT q.pmids, q.created_at, v.since_year, v.max_results "
+            "FROM query_variants v JOIN queries q ON q.key = v.key "
+            "WHERE v.family = ? AND (v.since_year IS NULL OR v.since_year <= ?) "
+            "AND q.created_at >= ? ORDER BY v.since_year DESC, q.created_at DESC",
+            (family, since_year, time.time() - self.query_ttl - self.max_stale)
+        ).fetchall()
+        return [{"pmids": json.loads(pmids), "created_at": created_at,
+                 "since_year": year, "max_results": max_results}
+                for pmids, created_at, year, max_results in rows]
+
+    def get_articles(self, pmids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Return the cached, unexpired articles among ``pmids``, keyed by PMID"""
+        if not pmids:
+            return {}
+
+        conn = self._connect()
+        oldest = time.time() - self.article_ttl
+        found = {}
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(pmids), 500):
+            chunk = pmids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT pmid, data FROM articles WHERE fetched_at >= ? AND pmid IN ({placeholders})",
+                [oldest] + chunk
+            ).fetchall()
+            for pmid, data in rows:
+                found[pmid] = json.loads(data)
+        return found
+
+    def ping(self) -> None:
+        """Raise if the cache database cannot be read"""
+        self._connect().execute("SELECT 1 FROM queries LIMIT 1").fetchall()
+
+    def iter_articles(self) -> Iterator[Dict[str, Any]]:
+        """Yield every cached article, without loading them all at once"""
+        for (data,) in self._connect().execute("SELECT data FROM articles"):
+            yield json.loads(data)
+
+    def put_articles(self, articles: List[Dict[str, Any]]) -> None:
+        """Store parsed articles keyed by their PMID, dropping expired ones"""
+        if not articles:
+            return
+
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO articles (pmid, data, fetched_at) VALUES (?, ?, ?)",
+                [(a["pmid"], json.dumps(a, ensure_ascii=False), now) for a in articles]
+            )
+            conn.execute("DELETE FROM articles WHERE fetched_at < ?", (now - self.article_ttl,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_links(self, pmids: List[str], linkname: str) -> Dict[str, List[str]]:
+        """Return the cached, unexpired neighbor lists among ``pmids``"""
+        if not pmids:
+            return {}
+
+        conn = self._connect()
+        oldest = time.time() - self.link_ttl
+        found = {}
+        for i in range(0, len(pmids), 500):
+            chunk = [int(pmid) for pmid in pmids[i:i + 500]]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT pmid, neighbors FROM links WHERE linkname = ? AND fetched_at >= ? "
+                f"AND pmid IN ({placeholders})", [linkname, oldest] + chunk
+            ).fetchall()
+            for pmid, blob in rows:
+                found[str(pmid)] = [str(n) for n in array.array("I", blob)]
+        return found
+
+    def put_links(self, adjacency: Dict[str, List[str]], linkname: str) -> None:
+        """
+        Store neighbor lists as packed 32-bit PMID arrays
+
+        A node with a few hundred neighbors takes about a kilobyte, so large
+        citation graphs stay small on disk.
+        """
+        if not adjacency:
+            return
+
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO links (pmid, linkname, neighbors, fetched_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(int(pmid), linkname, array.array("I", map(int, neighbors)).tobytes(), now)
+                 for pmid, neighbors in adjacency.items()]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def log_query(self, params: Dict[str, Any]) -> None:
+        """
+        Count one search in the query log
+
+        ``params`` are the keyword arguments the search was run with, so the
+        log key matches the query cache key built from them.
+        """
+        self._connect().execute(
+            "INSERT INTO query_log (key, params, count, last_seen) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT(key) DO UPDATE SET count = count + 1, last_seen = excluded.last_seen",
+            (self.make_key(**params), json.dumps(params, sort_keys=True, ensure_ascii=False),
+             time.time())
+        )
+
+    def top_queries(self, limit: int) -> List[Dict[str, Any]]:
+        """Most frequent logged searches, as {"params", "count", "last_seen"}"""
+        rows = self._connect().execute(
+            "SELECT params, count, last_seen FROM query_log "
+            "ORDER BY count DESC, last_seen DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [{"params": json.loads(params), "count": count, "last_seen": last_seen}
+                for params, count, last_seen in rows]
+
+    def try_lease(self, name: str, seconds: float) -> bool:
+        """
+        Claim a named lease for this process unless another process holds it
+
+        Used so that one-off background jobs run in only one worker.
+        """
+        owner = str(os.getpid())
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT owner, expires FROM leases WHERE name = ?", (name,)
+            ).fetchone()
+            claimed = row is None or row[0] == owner or row[1] < now
+            if claimed:
+                conn.execute(
+                    "INSERT OR REPLACE INTO leases (name, owner, expires) VALUES (?, ?, ?)",
+                    (name, owner, now + seconds)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return claimed
+
+    def release_lease(self, name: str) -> None:
+        """Give up a lease claimed by this process with ``try_lease``"""
+        conn = self._connect()
+        conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, str(os.getpid())))
+
+    def snapshot(self, path: str, top_n: int) -> int:
+        """
+        Write the ``top_n`` most frequent cached searches and their articles
+        to a gzipped JSON file
+
+        The file is written atomically, so concurrent snapshots from several
+        workers never leave a truncated file behind.
+
+        Returns:
+            Number of searches written
+        """
+        queries = []
+        pmids = []
+        for entry in self.top_queries(top_n):
+            row = self._connect().execute(
+                "SELECT q.pmids, q.created_at, v.family, v.since_year, v.max_results "
+                "FROM queries q LEFT JOIN query_variants v ON v.key = q.key WHERE q.key = ?",
+                (self.make_key(**entry["params"]),)
+            ).fetchone()
+            if row is None:
+                continue
+            entry["pmids"] = json.loads(row[0])
+            entry["created_at"] = row[1]
+            if row[2] is not None:
+                entry["variant"] = {"family": row[2], "since_year": row[3], "max_results": row[4]}
+            queries.append(entry)
+            pmids.extend(entry["pmids"])
+
+        articles = list(self.get_articles(list(dict.fromkeys(pmids))).values())
+        data = {"version": 1, "created_at": time.time(), "queries": queries, "articles": articles}
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return len(queries)
+
+    def restore(self, path: str) -> Tuple[int, int]:
+        """
+        Load a snapshot written by ``snapshot``
+
+        Entries already in the cache are kept. Restored searches keep their
+        original age, so old ones are served as stale and refreshed.
+
+        Returns:
+            Tuple of (searches, articles) read from the snapshot
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for entry in data["queries"]:
+                params = entry["params"]
+                key = self.make_key(**params)
+                conn.execute(
+                    "INSERT OR IGNORE INTO queries (key, pmids, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(entry["pmids"]), entry["created_at"])
+                )
+                variant = entry.get("variant")
+                if variant:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO query_variants (key, family, since_year, max_results) "
+                        "VALUES (?, ?, ?, ?)",
+                        (key, variant["family"], variant["since_year"], variant["max_results"])
+                    )
+                conn.execute(
+                    "INSERT INTO query_log (key, params, count, last_seen) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET count = max(count, excluded.count)",
+                    (key, json.dumps(params, sort_keys=True, ensure_ascii=False),
+                     entry["count"], entry["last_seen"])
+                )
+            conn.executemany(
+                "INSERT OR IGNORE INTO articles (pmid, data, fetched_at) VALUES (?, ?, ?)",
+                [(a["pmid"], json.dumps(a, ensure_ascii=False), data["created_at"])
+                 for a in data["articles"]]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(data["queries"]), len(data["articles"])
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> float:
+    """Token count of a bucket last written at ``updated``, as of ``now``"""
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+class SharedRateLimiter(_SQLiteStore):
+    """
+    Token bucket coordinated across processes through a shared SQLite file
+
+    NCBI allows 3 requests/s without an API key and 10 requests/s with one.
+    The budget applies to the whole deployment, so every worker draws from
+    the same bucket instead of each enforcing its own limit.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS rate_buckets (
+            name TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str, rate: float, burst: Optional[float] = None,
+                 name: str = "eutils"):
+        super().__init__(path)
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.name = name
+
+    def try_acquire(self, reserve: float = 0.0) -> float:
+        """
+        Take one token if available
+
+        Args:
+            reserve: Tokens that must remain in the bucket after this one is
+                taken. Low-priority callers pass a reserve so that
+                high-priority callers still find tokens when the budget is
+                saturated. Capped at ``burst - 1`` so that a full bucket
+                always serves every caller.
+
+        Returns:
+            0.0 if a token was taken, otherwise the number of seconds to wait
+            before one becomes available
+        """
+        reserve = min(reserve, self.burst - 1.0)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            tokens, updated = row if row else (self.burst, now)
+            tokens = _refill(tokens, updated, now, self.rate, self.burst)
+
+            if tokens >= 1.0 + reserve:
+                tokens -= 1.0
+                wait = 0.0
+            else:
+                wait = (1.0 + reserve - tokens) / self.rate
+
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                (self.name, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    async def acquire(self, reserve: float = 0.0) -> None:
+        """Wait until a token is available and take it"""
+        while True:
+            wait = self.try_acquire(reserve)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+class ApiKeyPool(_SQLiteStore):
+    """
+    Pool of NCBI API keys, each with its own rate budget
+
+    Every key gets a token bucket shared across processes. Requests go to
+    the key with the most tokens available, so load spreads over the pool
+    and aggregate throughput grows with the number of keys. A key that is
+    answered with 429 is taken out of rotation for ``cooldown`` seconds.
+
+    Keys are stored under a hash prefix; the keys themselves never reach
+    the database.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS api_keys (
+            name TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated REAL NOT NULL,
+            cooldown_until REAL NOT NULL DEFAULT 0,
+            requests INTEGER NOT NULL DEFAULT 0,
+            throttled INTEGER NOT NULL DEFAULT 0,
+            rate_estimate REAL NOT NULL DEFAULT 0
+        );
+    """
+
+    # Time constant (seconds) of the request rate moving average
+    RATE_WINDOW = 10.0
+
+    def __init__(self, path: str, keys: List[str], rate: float = 10.0,
+                 burst: float = 1.0, cooldown: float = 10.0):
+        super().__init__(path)
+        if not keys:
+            raise ValueError("ApiKeyPool needs at least one API key")
+        self.rate = rate
+        # A small burst paces each key evenly, so requests delayed in flight
+        # do not bunch up into a 429 at NCBI
+        self.burst = burst
+        self.cooldown = cooldown
+        self._keys = {self.key_id(key): key for key in keys}
+
+    @staticmethod
+    def key_id(key: str) -> str:
+        """Identifier of a key in the database and in metrics"""
+        return "key-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:8]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _rows(self, conn: sqlite3.Connection, now: float) -> Dict[str, list]:
+        placeholders = ",".join("?" * len(self._keys))
+        rows = {name: [self.burst, now, 0.0, 0, 0, 0.0] for name in self._keys}
+        for row in conn.execute(
+            "SELECT name, tokens, updated, cooldown_until, requests, throttled, rate_estimate "
+            f"FROM api_keys WHERE name IN ({placeholders})", list(self._keys)
+        ):
+            rows[row[0]] = list(row[1:])
+        return rows
+
+    def _decayed_rate(self, rate_estimate: float, updated: float, now: float) -> float:
+        return rate_estimate * math.exp(-max(0.0, now - updated) / self.RATE_WINDOW)
+
+    def try_acquire(self, reserve: float = 0.0) -> Tuple[Optional[str], float]:
+        """
+        Take a token from the key with the most capacity available
+
+        Args:
+            reserve: Tokens to leave in the chosen key's bucket, as for
+                SharedRateLimiter.try_acquire (capped at ``burst - 1``)
+
+        Returns:
+            Tuple of (api_key, 0.0) on success, or (None, seconds to wait)
+            if every key is exhausted or cooling down
+        """
+        reserve = min(reserve, self.burst - 1.0)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            best, best_tokens, wait = None, 0.0, float("inf")
+            rows = self._rows(conn, now)
+            for name, (tokens, updated, cooldown_until, *_rest) in rows.items():
+                if cooldown_until > now:
+                    wait = min(wait, cooldown_until - now)
+                    continue
+                tokens = _refill(tokens, updated, now, self.rate, self.burst)
+                if tokens < 1.0 + reserve:
+                    wait = min(wait, (1.0 + reserve - tokens) / self.rate)
+                elif tokens > best_tokens:
+                    best, best_tokens = name, tokens
+
+            if best is not None:
+                _, updated, cooldown_until, requests, throttled, rate_estimate = rows[best]
+                rate_estimate = self._decayed_rate(rate_estimate, updated, now) + 1.0 / self.RATE_WINDOW
+                conn.execute(
+                    "INSERT OR REPLACE INTO api_keys (name, tokens, updated, cooldown_until, "
+                    "requests, throttled, rate_estimate) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (best, best_tokens - 1.0, now, cooldown_until, requests + 1, throttled,
+                     rate_estimate)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if best is None:
+            return None, wait
+        return self._keys[best], 0.0
+
+    async def acquire(self, reserve: float = 0.0) -> str:
+        """Wait until some key has capacity, take a token and return the key"""
+        while True:
+            key, wait = self.try_acquire(reserve)
+            if key is not None:
+                return key
+            await asyncio.sleep(wait)
+
+    def report_throttled(self, key: str) -> None:
+        """Take a key out of rotation after NCBI answered 429 for it"""
+        name = self.key_id(key)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            _, updated, _, requests, throttled, rate_estimate = self._rows(conn, now)[name]
+            conn.execute(
+                "INSERT OR REPLACE INTO api_keys (name, tokens, updated, cooldown_until, "
+                "requests, throttled, rate_estimate) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, 0.0, now, now + self.cooldown, requests, throttled + 1,
+                 self._decayed_rate(rate_estimate, updated, now))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def metrics(self) -> List[Dict[str, Any]]:
+        """Per-key usage across all processes sharing the pool"""
+        now = time.time()
+        result = []
+        for name, (tokens, updated, cooldown_until, requests, throttled, rate_estimate) in \
+                self._rows(self._connect(), now).items():
+            current_rate = self._decayed_rate(rate_estimate, updated, now)
+            result.append({
+                "key": name,
+                "requests": requests,
+                "throttled": throttled,
+                "cooldown_remaining": max(0.0, cooldown_until - now),
+                "available_tokens": _refill(tokens, updated, now, self.rate, self.burst),
+                "request_rate": current_rate,
+                "utilization": current_rate / self.rate,
+            })
+        return result
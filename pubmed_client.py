@@ -1,30 +1,193 @@
 import httpx
 import asyncio
 import json
-from typing import Dict, List, Optional, Any
+import re
+import time
+import contextvars
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 import urllib.parse
 
+from pubmed_cache import SharedCache, SharedRateLimiter, ApiKeyPool
+from pubmed_query import SearchQuery, select_since
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+# The record's own PMID is the first one; cited articles' PMIDs follow later
+_PMID = re.compile(r"<PMID[^>]*>\s*(\d+)\s*</PMID>")
+
+
+class ArticleNotFoundError(LookupError):
+    """Raised when PubMed has no record for a requested PMID"""
+
+
+class _StageBudget:
+    """Time left for the upstream calls of one search stage (esearch, efetch)"""
+    
+    def __init__(self, timeout: float, configured: bool):
+        self.remaining = timeout
+        # Whether the timeout is the client's configured one rather than a
+        # shorter deadline chosen by the caller
+        self.configured = configured
+    
+    async def run(self, coro):
+        """Await an HTTP call, charging its duration to the budget"""
+        if self.remaining <= 0:
+            coro.close()
+            raise asyncio.TimeoutError()
+        started = time.monotonic()
+        try:
+            return await asyncio.wait_for(coro, self.remaining)
+        finally:
+            self.remaining -= time.monotonic() - started
+
+
+# Budget of the stage the current task is running, set by _with_deadline
+_stage_budget: contextvars.ContextVar[Optional[_StageBudget]] = contextvars.ContextVar(
+    "stage_budget", default=None)
+
+
 class PubMedClient:
     """Client for interacting with the PubMed E-utilities API"""
     
     BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
     
-    def __init__(self, api_key: Optional[str] = None):
+    # Maximum number of IDs sent in a single efetch request
+    EFETCH_BATCH_SIZE = 200
+    
+    # Maximum number of IDs sent in a single elink request
+    ELINK_BATCH_SIZE = 100
+    
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 cache: Optional[SharedCache] = None,
+                 rate_limiter: Optional[SharedRateLimiter] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 rate_reserve: float = 0.0,
+                 key_pool: Optional[ApiKeyPool] = None,
+                 reuse_results: bool = True,
+                 deadlines: Optional[Dict[str, float]] = None):
         self.api_key = api_key
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.breaker = breaker
+        # Rate-limit tokens left for higher-priority clients (see SharedRateLimiter.try_acquire)
+        self.rate_reserve = rate_reserve
+        # When set, every request takes its API key and rate budget from the pool
+        # instead of api_key/rate_limiter
+        self.key_pool = key_pool
+        # Answer searches from cached results with more results or a wider
+        # date range (see _reuse_cached)
+        self.reuse_results = reuse_results
+        # Default per-stage timeouts; only a stage that runs out of these
+        # counts as an upstream failure for the breaker, not one cut short
+        # by a tighter per-call deadline
+        self.deadlines = deadlines or {}
+        # Number of HTTP requests sent to E-utilities by this client
+        self.upstream_calls = 0
+        self._client = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """HTTP client, created on first use so cache hits never pay for it"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=30.0)
+        return self._client
     
     async def __aenter__(self):
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
+        await self.close()
     
     async def close(self):
         """Close the HTTP client"""
-        await self.client.aclose()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _get(self, endpoint: str, params: Dict[str, Any]) -> httpx.Response:
+        """
+        Send a rate-limited GET request to an E-utilities endpoint
+        
+        With a key pool, a request answered with 429 is retried on the next
+        available key while the throttled key cools down. Within a stage
+        deadline, only the HTTP call counts against it, not the wait for
+        rate-limit tokens.
+        """
+        budget = _stage_budget.get()
+        if self.api_key and not self.key_pool:
+            params["api_key"] = self.api_key
+        
+        if self.breaker:
+            self.breaker.before_call()
+        
+        try:
+            attempts = len(self.key_pool) + 1 if self.key_pool else 1
+            for attempt in range(attempts):
+                if self.key_pool:
+                    params["api_key"] = await self.key_pool.acquire(self.rate_reserve)
+                elif self.rate_limiter:
+                    await self.rate_limiter.acquire(self.rate_reserve)
+                
+                self.upstream_calls += 1
+                request = self.client.get(f"{self.base_url}/{endpoint}", params=params)
+                response = await (budget.run(request) if budget else request)
+                if response.status_code == 429 and self.key_pool:
+                    self.key_pool.report_throttled(params["api_key"])
+                    if attempt < attempts - 1:
+                        continue
+                break
+            
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            # Only server errors mean the upstream is unhealthy
+            if self.breaker:
+                if e.response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+            raise
+        except httpx.TransportError:
+            if self.breaker:
+                self.breaker.record_failure()
+            raise
+        except asyncio.TimeoutError:
+            if self.breaker:
+                if budget and budget.configured:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.release()
+            raise
+        except BaseException:
+            if self.breaker:
+                self.breaker.release()
+            raise
+        
+        if self.breaker:
+            self.breaker.record_success()
+        return response
+    
+    async def _with_deadline(self, coro, deadlines: Optional[Dict[str, float]], stage: str):
+        """
+        Await ``coro``, raising asyncio.TimeoutError once its upstream calls
+        have taken longer than the stage deadline
+        
+        ``deadlines`` defaults to the client's configured deadlines.
+        """
+        timeout = (deadlines or self.deadlines).get(stage)
+        if timeout is None:
+            return await coro
+        
+        configured = self.deadlines.get(stage)
+        budget = _StageBudget(timeout, configured is not None and timeout >= configured)
+        token = _stage_budget.set(budget)
+        try:
+            return await coro
+        finally:
+            _stage_budget.reset(token)
     
     async def search(self, query: str, max_results: int = 10, 
-                    sort: str = "relevance", date_range: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+                    sort: str = "relevance", date_range: Optional[Dict[str, str]] = None,
+                    deadlines: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
         """
         Search PubMed for articles matching the query
         
@@ -33,22 +196,173 @@ class PubMedClient:
             max_results: Maximum number of results to return
             sort: Sort order - "relevance" or "date"
             date_range: Optional date range filter {"from": "YYYY/MM/DD", "to": "YYYY/MM/DD"}
+            deadlines: Optional per-stage timeouts in seconds {"esearch": 5, "efetch": 10},
+                counted over the stage's upstream calls; defaults to the
+                client's configured deadlines
             
         Returns:
             List of article data
         """
+        articles, _ = await self.search_with_status(query, max_results, sort,
+                                                    date_range, deadlines)
+        return articles
+    
+    async def search_with_status(self, query: str, max_results: int = 10,
+                                 sort: str = "relevance",
+                                 date_range: Optional[Dict[str, str]] = None,
+                                 deadlines: Optional[Dict[str, float]] = None,
+                                 refresh: bool = False) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Search PubMed, reporting whether the result came from the cache
+        
+        Stale cache entries are returned as-is and are also used as a
+        fallback when the upstream call fails, so callers can serve them
+        while refreshing in the background.
+        
+        Args:
+            refresh: Skip the cache lookup and always query the upstream;
+                upstream errors are raised instead of falling back to a
+                stale entry
+            (other arguments as for ``search``)
+            
+        Returns:
+            Tuple of (articles, status), where status holds "cache" ("hit",
+            "stale" or "miss") and "age" of the cached entry in seconds;
+            results derived from another cached search also have "reused"
+            ("prefix" or "since_year")
+        """
+        id_list, status, cache_only = await self._search_ids(
+            query, max_results, sort, date_range, deadlines, refresh)
+        if not id_list:
+            return [], status
+        
+        # Step 2: Use efetch to get full article data
+        articles = await self._with_deadline(
+            self._get_articles(id_list, cache_only=cache_only), deadlines, "efetch")
+        return articles, status
+    
+    async def search_batches(self, query: str, max_results: int = 10,
+                             sort: str = "relevance",
+                             date_range: Optional[Dict[str, str]] = None,
+                             deadlines: Optional[Dict[str, float]] = None,
+                             first_batch: int = 20) -> AsyncIterator[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        """
+        Search PubMed, yielding articles in result order as they are fetched
+        
+        The first ``first_batch`` results are fetched on their own so they
+        can be shown quickly; the rest follow in efetch-sized batches. The
+        efetch deadline applies to each batch.
+        
+        Args:
+            first_batch: Number of results in the first batch
+            (other arguments as for ``search``)
+            
+        Yields:
+            Tuples of (articles, status) as for ``search_with_status``, with
+            the number of results in status["total"]. At least one (possibly
+            empty) batch is yielded.
+        """
+        id_list, status, cache_only = await self._search_ids(
+            query, max_results, sort, date_range, deadlines)
+        status = dict(status, total=len(id_list))
+        if not id_list:
+            yield [], status
+            return
+        
+        start = 0
+        size = max(1, first_batch)
+        while start < len(id_list):
+            batch = id_list[start:start + size]
+            yield await self._with_deadline(
+                self._get_articles(batch, cache_only=cache_only), deadlines, "efetch"), status
+            start += size
+            size = self.EFETCH_BATCH_SIZE
+    
+    async def _search_ids(self, query: str, max_results: int, sort: str,
+                          date_range: Optional[Dict[str, str]],
+                          deadlines: Optional[Dict[str, float]],
+                          refresh: bool = False) -> Tuple[List[str], Dict[str, Any], bool]:
+        """
+        Resolve a search to PMIDs through the query cache or esearch
+        
+        Returns:
+            Tuple of (PMIDs, status, cache_only); cache_only is set when a
+            stale entry is served because the upstream failed, in which case
+            articles should only be read from the cache
+        """
+        search = SearchQuery.from_term(query, max_results, sort, date_range)
+        cached = None
+        if self.cache:
+            cached = self.cache.get_query(search.cache_key)
+            if cached is not None and not refresh:
+                id_list, created_at = cached
+                state = "hit" if self.cache.is_fresh(created_at) else "stale"
+                return id_list, {"cache": state, "age": time.time() - created_at}, False
+            
+            reused = self._reuse_cached(search) if self.reuse_results and not refresh else None
+            if reused is not None:
+                id_list, created_at, how = reused
+                state = "hit" if self.cache.is_fresh(created_at) else "stale"
+                return id_list, {"cache": state, "age": time.time() - created_at,
+                                 "reused": how}, False
+        
+        try:
+            id_list = await self._with_deadline(
+                self._esearch(search.term, search.max_results, search.sort, search.date_range),
+                deadlines, "esearch")
+        except (CircuitOpenError, httpx.HTTPError, asyncio.TimeoutError):
+            # A refresh must report failure rather than pass off the stale entry
+            if cached is None or refresh:
+                raise
+            # Serve the stale entry rather than failing
+            id_list, created_at = cached
+            return id_list, {"cache": "stale", "age": time.time() - created_at}, True
+        
+        if self.cache:
+            self.cache.put_query(search.cache_key, id_list, family=search.family_key,
+                                 since_year=search.since_year, max_results=search.max_results)
+        return id_list, {"cache": "miss", "age": 0.0}, False
+    
+    def _reuse_cached(self, search: SearchQuery) -> Optional[Tuple[List[str], float, str]]:
+        """
+        Answer a search from a cached variant of the same search
+        
+        A variant with the same year filter and at least as many results
+        serves the search as a prefix. A variant with a wider date range
+        is filtered on the cached articles' publication years; the result
+        holds as long as the variant still contains ``max_results``
+        matching articles, or contained every match to begin with (fewer
+        results than it asked for).
+        
+        Returns:
+            Tuple of (PMIDs, created_at of the variant, "prefix" or
+            "since_year"), or None if no cached variant can answer
+        """
+        for variant in self.cache.query_variants(search.family_key, search.since_year):
+            pmids = variant["pmids"]
+            complete = len(pmids) < variant["max_results"]
+            if variant["since_year"] == search.since_year:
+                if complete or variant["max_results"] >= search.max_results:
+                    return pmids[:search.max_results], variant["created_at"], "prefix"
+                continue
+            
+            selected = select_since(pmids, self.cache.get_articles,
+                                    search.since_year, search.max_results)
+            if selected is not None and (complete or len(selected) == search.max_results):
+                return selected, variant["created_at"], "since_year"
+        return None
+    
+    async def _esearch(self, query: str, max_results: int, sort: str,
+                       date_range: Optional[Dict[str, str]]) -> List[str]:
+        """Run esearch and return the matching PMIDs"""
         # Step 1: Use esearch to get IDs
         search_params = {
             "db": "pubmed",
             "term": query,
             "retmax": max_results,
-            "usehistory": "y",
             "retmode": "json"
         }
         
-        if self.api_key:
-            search_params["api_key"] = self.api_key
-        
         # Add date range if provided
         if date_range:
             if "from" in date_range and "to" in date_range:
@@ -61,39 +375,38 @@ class PubMedClient:
             search_params["sort"] = "pub date"
         
         # Execute search
-        search_url = f"{self.BASE_URL}/esearch.fcgi"
-        search_response = await self.client.get(search_url, params=search_params)
-        search_response.raise_for_status()
+        search_response = await self._get("esearch.fcgi", search_params)
         search_data = search_response.json()
+        return search_data["esearchresult"]["idlist"]
+    
+    async def _get_articles(self, id_list: List[str], cache_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        Return articles for the given PMIDs in order, fetching only those
+        not already in the cache (or none at all if ``cache_only``)
+        """
+        found = self.cache.get_articles(id_list) if self.cache else {}
+        missing = [] if cache_only else [pmid for pmid in id_list if pmid not in found]
         
-        # Extract IDs and WebEnv, QueryKey for history server
-        id_list = search_data["esearchresult"]["idlist"]
-        web_env = search_data["esearchresult"]["webenv"]
-        query_key = search_data["esearchresult"]["querykey"]
-        
-        if not id_list:
-            return []
+        for i in range(0, len(missing), self.EFETCH_BATCH_SIZE):
+            batch = missing[i:i + self.EFETCH_BATCH_SIZE]
+            fetched = await self._fetch_batch(batch)
+            if self.cache:
+                self.cache.put_articles(fetched)
+            for article in fetched:
+                found[article["pmid"]] = article
         
-        # Step 2: Use efetch to get full article data
+        return [found[pmid] for pmid in id_list if pmid in found]
+    
+    async def _fetch_batch(self, id_list: List[str]) -> List[Dict[str, Any]]:
+        """Fetch and parse one efetch batch of articles by PMID"""
         fetch_params = {
             "db": "pubmed",
-            "query_key": query_key,
-            "WebEnv": web_env,
-            "retmax": max_results,
+            "id": ",".join(id_list),
             "retmode": "xml",
         }
         
-        if self.api_key:
-            fetch_params["api_key"] = self.api_key
-        
-        fetch_url = f"{self.BASE_URL}/efetch.fcgi"
-        fetch_response = await self.client.get(fetch_url, params=fetch_params)
-        fetch_response.raise_for_status()
-        
-        xml_content = fetch_response.text
-        articles = self._process_xml_response(xml_content, id_list)
-        
-        return articles
+        fetch_response = await self._get("efetch.fcgi", fetch_params)
+        return self._process_xml_response(fetch_response.text, id_list)
     
     def _extract_xml_tag(self, xml: str, tag_name: str, start_idx: int = 0) -> str:
         """Extract content from an XML tag"""
@@ -121,28 +434,50 @@ class PubMedClient:
             
         return xml[start:end].strip()
     
-    def _process_xml_response(self, xml_content: str, id_list: List[str]) -> List[Dict[str, Any]]:
-        """Process XML response from PubMed"""
+    def _process_xml_response(self, xml_content: str,
+                              id_list: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Process XML response from PubMed
+        
+        Each article is keyed by the PMID in its own record, since efetch
+        does not return records in the requested order and omits PMIDs it
+        cannot find. With ``id_list``, records for other PMIDs are skipped.
+        """
         articles = []
+        wanted = set(id_list) if id_list is not None else None
+        position = 0
         
-        for pmid in id_list:
+        while True:
             # Find article section
-            article_start = xml_content.find(f"<PubmedArticle>")
+            article_start = xml_content.find("<PubmedArticle>", position)
             if article_start == -1:
-                continue
+                break
                 
             article_end = xml_content.find("</PubmedArticle>", article_start)
             if article_end == -1:
-                continue
+                break
                 
             article_xml = xml_content[article_start:article_end + 16]
+            position = article_end + 16
+            
+            match = _PMID.search(article_xml)
+            if match is None:
+                continue
+            pmid = match.group(1)
+            if wanted is not None and pmid not in wanted:
+                continue
             
             # Extract basic information
             title = self._extract_xml_tag(article_xml, "ArticleTitle")
             abstract = self._extract_xml_tag(article_xml, "AbstractText")
             journal = self._extract_xml_tag(article_xml, "Title")
-            year = self._extract_xml_tag(article_xml, "Year")
-            month = self._extract_xml_tag(article_xml, "Month")
+            
+            # Publication date of the journal issue; other dates (completed,
+            # revised) may come first in the record
+            pub_date = self._extract_xml_tag(article_xml, "PubDate") or article_xml
+            year = (self._extract_xml_tag(pub_date, "Year")
+                    or self._extract_xml_tag(pub_date, "MedlineDate"))
+            month = self._extract_xml_tag(pub_date, "Month")
             
             # Extract authors
             authors = []
@@ -195,9 +530,6 @@ class PubMedClient:
             }
             
             articles.append(article_data)
-            
-            # Remove this article from the XML to process the next one
-            xml_content = xml_content[article_end + 16:]
         
         return articles
     
@@ -205,81 +537,111 @@ class PubMedClient:
         """
         Get detailed information about a specific article by PMID
         
+        Uses the article cache and the same efetch parser as searches.
+        
         Args:
             pmid: PubMed ID of the article
             
         Returns:
             Dictionary with article details
+            
+        Raises:
+            ArticleNotFoundError: PubMed returned no record for ``pmid``
         """
-        params = {
-            "db": "pubmed",
-            "id": pmid,
-            "retmode": "xml",
-            "rettype": "abstract"
-        }
+        articles = await self._get_articles([pmid])
+        if not articles:
+            raise ArticleNotFoundError(f"PMID {pmid} not found")
+        return articles[0]
+    
+    async def get_links(self, pmids: List[str],
+                        linkname: str = "pubmed_pubmed") -> Dict[str, List[str]]:
+        """
+        Get linked articles for many PMIDs with batched elink requests
         
-        if self.api_key:
-            params["api_key"] = self.api_key
+        Each batch sends up to ELINK_BATCH_SIZE ids as separate ``id``
+        parameters, which makes elink return one link set per id. Neighbor
+        lists already in the cache are not requested again.
         
-        url = f"{self.BASE_URL}/efetch.fcgi"
-        response = await self.client.get(url, params=params)
-        response.raise_for_status()
+        Args:
+            pmids: PubMed IDs to look up
+            linkname: E-utilities link name, e.g. "pubmed_pubmed" (similar
+                articles), "pubmed_pubmed_citedin" (cited by) or
+                "pubmed_pubmed_refs" (references)
+            
+        Returns:
+            Dictionary mapping each PMID to its linked PMIDs
+        """
+        pmids = list(dict.fromkeys(pmids))
+        found = self.cache.get_links(pmids, linkname) if self.cache else {}
+        missing = [pmid for pmid in pmids if pmid not in found]
         
-        xml_content = response.text
+        for i in range(0, len(missing), self.ELINK_BATCH_SIZE):
+            batch = missing[i:i + self.ELINK_BATCH_SIZE]
+            params = {
+                "dbfrom": "pubmed",
+                "db": "pubmed",
+                "cmd": "neighbor",
+                "linkname": linkname,
+                "id": batch,
+                "retmode": "json"
+            }
+            
+            response = await self._get("elink.fcgi", params)
+            adjacency = {pmid: [] for pmid in batch}
+            for linkset in response.json().get("linksets", []):
+                ids = linkset.get("ids") or []
+                if not ids:
+                    continue
+                source = str(ids[0])
+                for linksetdb in linkset.get("linksetdbs", []):
+                    if linksetdb.get("linkname") == linkname:
+                        adjacency[source] = [str(link) for link in linksetdb.get("links", [])
+                                             if str(link) != source]
+            
+            if self.cache:
+                self.cache.put_links(adjacency, linkname)
+            found.update(adjacency)
         
-        # Extract article details
-        title = self._extract_xml_tag(xml_content, "ArticleTitle")
-        abstract = self._extract_xml_tag(xml_content, "AbstractText")
-        journal = self._extract_xml_tag(xml_content, "Title")
-        year = self._extract_xml_tag(xml_content, "Year")
-        month = self._extract_xml_tag(xml_content, "Month")
+        return {pmid: found.get(pmid, []) for pmid in pmids}
+    
+    async def expand_graph(self, seeds: List[str], linkname: str = "pubmed_pubmed",
+                           hops: int = 1, max_neighbors: Optional[int] = None,
+                           max_nodes: int = 10000) -> Dict[str, Any]:
+        """
+        Expand the link graph around seed PMIDs breadth-first
         
-        # Extract authors
-        authors = []
-        author_idx = 0
-        while True:
-            last_name = self._extract_xml_tag(xml_content, "LastName", start_idx=author_idx)
-            if not last_name:
-                break
-                
-            fore_name = self._extract_xml_tag(xml_content, "ForeName", start_idx=author_idx)
-            authors.append(f"{fore_name} {last_name}".strip())
+        Every hop costs one batched get_links call for the new frontier, so
+        nodes reached earlier or cached from previous expansions are never
+        looked up twice.
+        
+        Args:
+            seeds: PubMed IDs to start from
+            linkname: E-utilities link name (see get_links)
+            hops: Number of hops to expand
+            max_neighbors: Keep at most this many neighbors per node
+            max_nodes: Stop adding nodes once the graph reaches this size
             
-            author_idx = xml_content.find("LastName", author_idx + 1)
-            if author_idx == -1:
-                break
+        Returns:
+            Dictionary with "nodes" (PMID -> hop distance) and "edges"
+            (PMID -> linked PMIDs) for every expanded node
+        """
+        nodes = {pmid: 0 for pmid in dict.fromkeys(seeds)}
+        edges = {}
+        frontier = list(nodes)
         
-        # Extract DOI if available
-        doi = ""
-        doi_idx = xml_content.find("<ArticleId IdType=\"doi\">")
-        if doi_idx != -1:
-            doi_start = doi_idx + len("<ArticleId IdType=\"doi\">")
-            doi_end = xml_content.find("</ArticleId>", doi_start)
-            if doi_end != -1:
-                doi = xml_content[doi_start:doi_end].strip()
-        
-        # Extract keywords if available
-        keywords = []
-        keyword_idx = 0
-        while True:
-            keyword = self._extract_xml_tag(xml_content, "Keyword", start_idx=keyword_idx)
-            if not keyword:
-                break
-                
-            keywords.append(keyword)
-            keyword_idx = xml_content.find("<Keyword", keyword_idx + 1)
-            if keyword_idx == -1:
+        for hop in range(1, hops + 1):
+            if not frontier:
                 break
+            
+            adjacency = await self.get_links(frontier, linkname)
+            next_frontier = []
+            for pmid in frontier:
+                neighbors = adjacency.get(pmid, [])[:max_neighbors]
+                edges[pmid] = neighbors
+                for neighbor in neighbors:
+                    if neighbor not in nodes and len(nodes) < max_nodes:
+                        nodes[neighbor] = hop
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
         
-        return {
-            "pmid": pmid,
-            "title": title,
-            "abstract": abstract,
-            "journal": journal,
-            "publication_date": f"{year} {month}".strip(),
-            "authors": authors,
-            "doi": doi,
-            "keywords": keywords,
-            "url": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
-            "doi_url": f"https://doi.org/{doi}" if doi else ""
-        }
+        return {"nodes": nodes, "edges": edges}
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Columnar article snapshots for bibliometric aggregates
+
+Articles are stored as NumPy arrays: one row per article, journals encoded
+as integer codes into a string dictionary, and authors and keywords as
+variable-length lists of codes (offsets + values). A snapshot is a
+directory of ``.npy`` files that is memory-mapped when loaded, so a large
+corpus costs nothing until it is aggregated.
+
+Usage: python pubmed_columnar.py CACHE_PATH OUTPUT_DIR
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import tempfile
+from array import array
+from typing import Dict, Iterable, List, Optional, Any
+
+import numpy as np
+
+_YEAR = re.compile(r"\b(1[89]\d\d|2\d\d\d)\b")
+VERSION = 1
+
+
+class StringDictionary:
+    """Immutable list of strings stored as a UTF-8 blob plus offsets"""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def from_strings(cls, strings: List[str]) -> "StringDictionary":
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, code: int) -> str:
+        return self.blob[self.offsets[code]:self.offsets[code + 1]].tobytes().decode("utf-8")
+
+
+class _Encoder:
+    """Assigns consecutive codes to strings while a snapshot is built"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.codes)
+        return code
+
+    def dictionary(self) -> StringDictionary:
+        return StringDictionary.from_strings(list(self.codes))
+
+
+def _parse_year(publication_date: str) -> int:
+    match = _YEAR.search(publication_date or "")
+    return int(match.group(1)) if match else 0
+
+
+class ArticleColumns:
+    """
+    Dictionary-encoded columns for a set of articles
+
+    Attributes:
+        pmid: int64 PMIDs
+        year: int16 publication years, 0 when unknown
+        journal: int32 codes into ``journals``, -1 when missing
+        author_offsets, author_codes: authors of row i are
+            ``author_codes[author_offsets[i]:author_offsets[i + 1]]``
+        keyword_offsets, keyword_codes: likewise for (lower-cased) keywords
+    """
+
+    ARRAYS = ("pmid", "year", "journal", "author_offsets", "author_codes",
+              "keyword_offsets", "keyword_codes")
+    DICTIONARIES = ("journals", "authors", "keywords")
+
+    def __init__(self, **columns):
+        for name in self.ARRAYS + self.DICTIONARIES:
+            setattr(self, name, columns[name])
+
+    def __len__(self) -> int:
+        return len(self.pmid)
+
+    @classmethod
+    def from_articles(cls, articles: Iterable[Dict[str, Any]]) -> "ArticleColumns":
+        """
+        Encode articles as returned by PubMedClient
+
+        ``articles`` may be any iterable, so a large corpus can be streamed
+        without holding all article dicts in memory.
+        """
+        pmids, years, journal_codes = array("q"), array("h"), array("i")
+        author_offsets, author_codes = array("q", [0]), array("i")
+        keyword_offsets, keyword_codes = array("q", [0]), array("i")
+        journals, authors, keywords = _Encoder(), _Encoder(), _Encoder()
+
+        for article in articles:
+            pmids.append(int(article["pmid"]))
+            years.append(_parse_year(article.get("publication_date", "")))
+            journal = article.get("journal")
+            journal_codes.append(journals.encode(journal) if journal else -1)
+            # Each author and keyword counts once per article
+            author_codes.extend(authors.encode(a)
+                                for a in dict.fromkeys(article.get("authors") or ()))
+            author_offsets.append(len(author_codes))
+            keyword_codes.extend(keywords.encode(k) for k in dict.fromkeys(
+                k.strip().lower() for k in article.get("keywords") or ()) if k)
+            keyword_offsets.append(len(keyword_codes))
+
+        return cls(
+            pmid=np.frombuffer(pmids, dtype=np.int64),
+            year=np.frombuffer(years, dtype=np.int16),
+            journal=np.frombuffer(journal_codes, dtype=np.int32),
+            author_offsets=np.frombuffer(author_offsets, dtype=np.int64),
+            author_codes=np.frombuffer(author_codes, dtype=np.int32),
+            keyword_offsets=np.frombuffer(keyword_offsets, dtype=np.int64),
+            keyword_codes=np.frombuffer(keyword_codes, dtype=np.int32),
+            journals=journals.dictionary(),
+            authors=authors.dictionary(),
+            keywords=keywords.dictionary(),
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Write the columns to directory ``path``
+
+        The snapshot is written to a new directory next to ``path`` and
+        swapped in, so readers never see a partial directory and concurrent
+        saves (from any thread or process) never share a directory. Readers
+        may briefly find ``path`` missing during the swap.
+        """
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=parent, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        for name in self.ARRAYS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name))
+        for name in self.DICTIONARIES:
+            dictionary = getattr(self, name)
+            np.save(os.path.join(tmp_path, f"{name}_offsets.npy"), dictionary.offsets)
+            np.save(os.path.join(tmp_path, f"{name}_blob.npy"), dictionary.blob)
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump({"version": VERSION, "articles": len(self), "created_at": time.time()}, f)
+
+        old_path = tmp_path[:-len(".tmp")] + ".old"
+        for attempt in range(5):
+            shutil.rmtree(old_path, ignore_errors=True)
+            try:
+                os.rename(path, old_path)
+            except FileNotFoundError:
+                pass
+            try:
+                os.rename(tmp_path, path)
+                break
+            except OSError:
+                # Another save swapped its snapshot in between the two renames
+                if attempt == 4:
+                    raise
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "ArticleColumns":
+        """Load a snapshot written by ``save``, memory-mapped by default"""
+        mode = "r" if mmap else None
+        columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+                   for name in cls.ARRAYS}
+        for name in cls.DICTIONARIES:
+            columns[name] = StringDictionary(
+                np.load(os.path.join(path, f"{name}_offsets.npy"), mmap_mode=mode),
+                np.load(os.path.join(path, f"{name}_blob.npy"), mmap_mode=mode))
+        return cls(**columns)
+
+    def select(self, pmids: Optional[Iterable] = None, since_year: Optional[int] = None,
+               until_year: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        Boolean row mask for the given filters, or None to select every row
+        """
+        mask = None
+        if pmids is not None:
+            mask = np.isin(self.pmid, np.fromiter((int(p) for p in pmids), dtype=np.int64))
+        if since_year is not None:
+            mask = (self.year >= since_year) if mask is None else mask & (self.year >= since_year)
+        if until_year is not None:
+            in_range = (self.year > 0) & (self.year <= until_year)
+            mask = in_range if mask is None else mask & in_range
+        return mask
+
+    @staticmethod
+    def _top(counts: np.ndarray, dictionary: StringDictionary, top: int) -> List[Dict[str, Any]]:
+        if counts.size == 0:
+            return []
+        top = min(top, np.count_nonzero(counts))
+        if top == 0:
+            return []
+        best = np.argpartition(counts, -top)[-top:]
+        # Highest count first, ties by dictionary order
+        best = best[np.lexsort((best, -counts[best]))]
+        return [{"name": dictionary[int(code)], "count": int(counts[code])} for code in best]
+
+    def _list_counts(self, offsets: np.ndarray, codes: np.ndarray, size: int,
+                     mask: Optional[np.ndarray]) -> np.ndarray:
+        if mask is not None:
+            codes = codes[np.repeat(mask, np.diff(offsets))]
+        return np.bincount(codes, minlength=size)
+
+    def aggregate(self, mask: Optional[np.ndarray] = None, top: int = 10) -> Dict[str, Any]:
+        """
+        Bibliometric aggregates over the selected rows
+
+        Args:
+            mask: Row mask from ``select``; None aggregates every row
+            top: Number of journals, authors and keywords to return
+
+        Returns:
+            Dict with the article count, top journals, authors and keywords
+            with their counts, and articles per publication year
+        """
+        journal = self.journal if mask is None else self.journal[mask]
+        year = self.year if mask is None else self.year[mask]
+
+        journal_counts = np.bincount(journal[journal >= 0], minlength=len(self.journals))
+        author_counts = self._list_counts(self.author_offsets, self.author_codes,
+                                          len(self.authors), mask)
+        keyword_counts = self._list_counts(self.keyword_offsets, self.keyword_codes,
+                                           len(self.keywords), mask)
+
+        known = year[year > 0].astype(np.int64)
+        years = {}
+        if known.size:
+            first = int(known.min())
+            per_year = np.bincount(known - first)
+            years = {str(first + i): int(n) for i, n in enumerate(per_year) if n}
+
+        return {
+            "articles": int(journal.size),
+            "top_journals": self._top(journal_counts, self.journals, top),
+            "top_authors": self._top(author_counts, self.authors, top),
+            "top_keywords": self._top(keyword_counts, self.keywords, top),
+            "years": years,
+        }
+
+
+def export_cache(cache, path: str) -> int:
+    """
+    Write every article in a SharedCache to a columnar snapshot
+
+    Returns:
+        Number of articles written
+    """
+    columns = ArticleColumns.from_articles(cache.iter_articles())
+    columns.save(path)
+    return len(columns)
+
+
+if __name__ == "__main__":
+    from pubmed_cache import SharedCache
+
+    if len(sys.argv) != 3:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+    started = time.perf_counter()
+    count = export_cache(SharedCache(sys.argv[1]), sys.argv[2])
+    print(f"Exported {count} articles to {sys.argv[2]} in {time.perf_counter() - started:.1f}s")
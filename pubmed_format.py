@@ -0,0 +1,49 @@
+"""
+不依賴 Flask 的查詢構建與 Markdown 格式化，供服務器與批次命令行工具共用
+"""
+
+from pubmed_query import SearchQuery
+
+
+def build_query(query, since_year):
+    """構建完整查詢（規範化空白與年份，讓相同查詢使用同一個快取鍵）"""
+    return SearchQuery(query, since_year=since_year).term
+
+
+def format_for_claude(query, results):
+    """將搜索結果格式化為 Claude 友好的 Markdown 格式"""
+    formatted = f"# PubMed搜索結果: {query}\n\n"
+    
+    if not results:
+        formatted += "未找到結果。\n"
+    else:
+        for i, article in enumerate(results, 1):
+            # 標題和基本信息
+            formatted += f"## {i}. {article['title']}\n"
+            formatted += f"**期刊**: {article['journal']}, **日期**: {article['publication_date']}\n\n"
+            
+            # 摘要
+            if article['abstract']:
+                formatted += f"**摘要**: {article['abstract']}\n\n"
+            else:
+                formatted += "**摘要**: 未提供\n\n"
+            
+            # 作者
+            if article['authors']:
+                formatted += f"**作者**: {', '.join(article['authors'])}\n\n"
+            
+            # 標識符和連結
+            formatted += f"**PMID**: {article['pmid']}"
+            if article['doi']:
+                formatted += f", **DOI**: {article['doi']}"
+            formatted += f"\n**鏈接**: {article['url']}\n\n"
+            
+            # 合併的相似文章
+            if article.get('similar_articles'):
+                similar = ", ".join(f"PMID {s['pmid']}" for s in article['similar_articles'])
+                formatted += f"**相似文章**: {similar}\n\n"
+            
+            if i < len(results):
+                formatted += "---\n\n"
+    
+    return formatted
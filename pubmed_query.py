@@ -0,0 +1,117 @@
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from pubmed_cache import SharedCache
+
+# The publication-year filter SearchQuery.term appends for ``since_year``
+_SINCE_YEAR = re.compile(r"^\((?P<terms>.*)\) AND (?P<year>\d+):3000\[PDAT\]$")
+_YEAR = re.compile(r"\b(\d{4})\b")
+
+
+def _parse_year(value: Any) -> Optional[int]:
+    """Year from a form/JSON value; None when empty, zero or not a number"""
+    if not value or not str(value).strip():
+        return None
+    try:
+        return int(value) or None
+    except ValueError:
+        return None
+
+
+def publication_year(article: Dict[str, Any]) -> Optional[int]:
+    """Publication year of a parsed article, or None if it is unknown"""
+    match = _YEAR.search(article.get("publication_date") or "")
+    return int(match.group(1)) if match else None
+
+
+def select_since(pmids: List[str], get_articles: Callable[[List[str]], Dict[str, Dict[str, Any]]],
+                 since_year: int, limit: int, chunk_size: int = 200) -> Optional[List[str]]:
+    """
+    Keep the first ``limit`` PMIDs published in or after ``since_year``
+
+    Args:
+        pmids: PMIDs in result order
+        get_articles: Returns the parsed articles for some PMIDs, keyed by
+            PMID (e.g. SharedCache.get_articles); called in chunks, only
+            until ``limit`` PMIDs are selected
+
+    Returns:
+        The selected PMIDs in result order, or None if an article whose
+        year is needed is missing or has no known publication year
+    """
+    selected = []
+    for i in range(0, len(pmids), chunk_size):
+        if len(selected) >= limit:
+            break
+        chunk = pmids[i:i + chunk_size]
+        articles = get_articles(chunk)
+        for pmid in chunk:
+            if len(selected) >= limit:
+                break
+            year = publication_year(articles[pmid]) if pmid in articles else None
+            if year is None:
+                return None
+            if year >= since_year:
+                selected.append(pmid)
+    return selected
+
+
+class SearchQuery:
+    """
+    A search split into its terms and filters
+
+    Parameters are canonicalized (whitespace, sort order, year) so that
+    equivalent searches share one cache key. Searches that differ only in
+    ``max_results`` and ``since_year`` share a ``family_key``; a cached
+    result can answer another search of its family when it holds at least
+    as many results and covers at least as wide a date range.
+    """
+
+    def __init__(self, terms: str, max_results: int = 10, sort: str = "relevance",
+                 since_year: Any = None, date_range: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            terms: Search terms in PubMed syntax, without the year filter
+            max_results: Maximum number of results
+            sort: "relevance" or "date"; anything else means relevance
+            since_year: Only include articles published in or after this year
+            date_range: Optional esearch date range {"from": ..., "to": ...}
+        """
+        self.terms = " ".join(str(terms).split())
+        self.max_results = int(max_results)
+        self.sort = "date" if sort == "date" else "relevance"
+        self.since_year = _parse_year(since_year)
+        self.date_range = date_range or None
+
+    @classmethod
+    def from_term(cls, term: str, max_results: int = 10, sort: str = "relevance",
+                  date_range: Optional[Dict[str, str]] = None) -> "SearchQuery":
+        """Parse a full esearch term, recognizing the year filter added by ``term``"""
+        term = " ".join(term.split())
+        match = _SINCE_YEAR.match(term)
+        if match:
+            return cls(match.group("terms"), max_results, sort, match.group("year"), date_range)
+        return cls(term, max_results, sort, None, date_range)
+
+    @property
+    def term(self) -> str:
+        """The esearch term, with the year filter when ``since_year`` is set"""
+        if self.since_year is None:
+            return self.terms
+        return f"({self.terms}) AND {self.since_year}:3000[PDAT]"
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        """Keyword arguments for PubMedClient.search_with_status"""
+        return {"query": self.term, "max_results": self.max_results,
+                "sort": self.sort, "date_range": self.date_range}
+
+    @property
+    def cache_key(self) -> str:
+        """Key of this exact search in the query cache and query log"""
+        return SharedCache.make_key(**self.params)
+
+    @property
+    def family_key(self) -> str:
+        """Key shared by the variants of this search in max_results and since_year"""
+        return SharedCache.make_key(query=self.terms, sort=self.sort, date_range=self.date_range)
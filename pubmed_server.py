@@ -1,10 +1,28 @@
 #!/usr/bin/env python3
 import os
+import sys
+import time
+import atexit
+import signal
+import socket
+import select
 import asyncio
 import json
-from flask import Flask, request, jsonify, render_template, redirect, url_for
+import threading
+from collections import deque
+import httpx
+from flask import (Flask, Response, request, jsonify, render_template, redirect, url_for, g,
+                   has_request_context, stream_with_context, send_file)
 from dotenv import load_dotenv
-from pubmed_client import PubMedClient
+from pubmed_client import PubMedClient, ArticleNotFoundError
+from pubmed_cache import SharedCache, SharedRateLimiter, ApiKeyPool
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from admission import AdmissionController, AdmissionRejected, PriorityClass
+from warmup import CacheWarmer
+from profiling import RequestProfiler
+from upstream import UpstreamRunner, ClientDisconnected
+from pubmed_format import build_query, format_for_claude
+from pubmed_query import SearchQuery
 
 # 加載環境變量
 load_dotenv()
@@ -16,12 +34,472 @@ API_KEY = os.getenv("PUBMED_API_KEY")
 DEBUG = os.getenv("DEBUG", "False").lower() in ("true", "1", "t")
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", "8000"))
+BASE_URL = os.getenv("PUBMED_BASE_URL", PubMedClient.BASE_URL)
+
+# 所有工作進程共用的快取與速率限制（SQLite WAL 檔案）
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(".cache", "pubmed.sqlite3"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "3600"))
+# 過期的快取結果在此時間內仍可返回，同時在背景刷新
+CACHE_MAX_STALE = float(os.getenv("CACHE_MAX_STALE", "86400"))
+# 快取的文章超過此時間（秒，預設 30 天）後重新抓取，以取得更正與撤稿資訊
+ARTICLE_TTL = float(os.getenv("ARTICLE_TTL", str(30 * 86400)))
+# NCBI 限制：無 API 金鑰每秒 3 次，有金鑰每秒 10 次
+RATE_LIMIT = float(os.getenv("RATE_LIMIT", "10" if API_KEY else "3"))
+# 多個 API 金鑰（逗號分隔），每個金鑰各自有速率額度
+API_KEYS = [k.strip() for k in os.getenv("PUBMED_API_KEYS", "").split(",") if k.strip()]
+RATE_LIMIT_PER_KEY = float(os.getenv("RATE_LIMIT_PER_KEY", "10"))
+# 收到 429 的金鑰暫停使用的秒數
+KEY_COOLDOWN = float(os.getenv("KEY_COOLDOWN", "10"))
+
+# 斷路器：上游連續失敗後在重置時間內直接失敗
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+
+# 各階段截止時間（秒），請求可以設定更短的值；total 是整個請求等待上游的上限，
+# 應低於 gunicorn 的 WORKER_TIMEOUT
+DEADLINES = {
+    "esearch": float(os.getenv("ESEARCH_DEADLINE", "10")),
+    "efetch": float(os.getenv("EFETCH_DEADLINE", "20")),
+    "total": float(os.getenv("REQUEST_DEADLINE", "50")),
+}
+
+# 准入控制：網頁互動請求優先於批次 API 請求，超載時返回 429
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "True").lower() in ("true", "1", "t")
+ADMISSION_CAPACITY = int(os.getenv("ADMISSION_CAPACITY", "16"))
+BATCH_MAX_CONCURRENT = int(os.getenv("BATCH_MAX_CONCURRENT", str(max(1, ADMISSION_CAPACITY // 2))))
+INTERACTIVE_QUEUE = int(os.getenv("INTERACTIVE_QUEUE", "32"))
+BATCH_QUEUE = int(os.getenv("BATCH_QUEUE", "64"))
+INTERACTIVE_QUEUE_TIME = float(os.getenv("INTERACTIVE_QUEUE_TIME", "5"))
+BATCH_QUEUE_TIME = float(os.getenv("BATCH_QUEUE_TIME", "30"))
+CLIENT_MAX_CONCURRENT = int(os.getenv("CLIENT_MAX_CONCURRENT", "4"))
+# 識別客戶端的請求頭（須由可信的反向代理設定並覆蓋客戶端自帶的值）；留空時按 IP 識別
+CLIENT_ID_HEADER = os.getenv("CLIENT_ID_HEADER", "")
+# 批次請求取用速率令牌時需保留給互動請求的令牌數
+BATCH_RATE_RESERVE = float(os.getenv("BATCH_RATE_RESERVE", "2"))
+
+# 逐步載入結果時每頁的文章數（第一頁單獨抓取以盡快顯示）
+STREAM_PAGE_SIZE = int(os.getenv("STREAM_PAGE_SIZE", "20"))
+MAX_STREAM_PAGE_SIZE = 100
+
+# 快取預熱：啟動時還原快照，並在背景重新執行最常見的查詢
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", os.path.join(os.path.dirname(CACHE_PATH), "snapshot.json.gz")
+                          if CACHE_PATH else "")
+SNAPSHOT_TOP_N = int(os.getenv("SNAPSHOT_TOP_N", "500"))
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "True").lower() in ("true", "1", "t")
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", "100"))
+
+# 性能剖析（預設關閉）：帶 X-Profile-Token 的請求以 cProfile 執行，
+# 或按抽樣率剖析並保留超過慢請求門檻的結果
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(".cache", "profiles"))
+SLOW_REQUEST_THRESHOLD = float(os.getenv("SLOW_REQUEST_THRESHOLD", "0"))
+SLOW_PROFILE_SAMPLE_RATE = float(os.getenv("SLOW_PROFILE_SAMPLE_RATE", "0.01"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "100"))
+
+# 互動請求的路徑，其餘 /api/ 請求視為批次
+INTERACTIVE_PATHS = {"/", "/search", "/search/stream"}
+# 不經准入控制的路徑
+ADMISSION_EXEMPT = {"/api/metrics", "/healthz", "/readyz"}
+
+cache = SharedCache(CACHE_PATH, query_ttl=CACHE_TTL, max_stale=CACHE_MAX_STALE,
+                    article_ttl=ARTICLE_TTL) if CACHE_PATH else None
+rate_limiter = SharedRateLimiter(CACHE_PATH, rate=RATE_LIMIT) if CACHE_PATH else None
+key_pool = (ApiKeyPool(CACHE_PATH, API_KEYS, rate=RATE_LIMIT_PER_KEY, cooldown=KEY_COOLDOWN)
+            if CACHE_PATH and API_KEYS else None)
+breaker = CircuitBreaker(failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET)
+admission = AdmissionController(
+    capacity=ADMISSION_CAPACITY,
+    classes=[
+        PriorityClass("interactive", ADMISSION_CAPACITY, INTERACTIVE_QUEUE, INTERACTIVE_QUEUE_TIME),
+        PriorityClass("batch", BATCH_MAX_CONCURRENT, BATCH_QUEUE, BATCH_QUEUE_TIME),
+    ],
+    max_per_client=CLIENT_MAX_CONCURRENT
+)
+profiler = RequestProfiler(PROFILE_DIR, token=PROFILING_TOKEN,
+                           slow_threshold=SLOW_REQUEST_THRESHOLD,
+                           sample_rate=SLOW_PROFILE_SAMPLE_RATE, keep=PROFILE_KEEP)
+# 每個進程一個背景事件循環執行上游請求：相同的並發請求共用一次呼叫，
+# 客戶端斷開或超過截止時間時停止等待，沒有其他等待者時取消上游請求
+upstream = UpstreamRunner()
+
+# 背景事件循環上按優先級共用的客戶端（保留 HTTP 連接池）
+_clients = {}
+_clients_lock = threading.Lock()
+
+# 正在背景刷新的查詢
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+# 逐步載入的首批結果時間與總時間（秒）
+_stream_timings = deque(maxlen=1000)
+
+# 啟動後每分鐘的快取命中統計（僅前 60 分鐘）
+BOOT_TIME = time.time()
+_cache_stats = {}
+_cache_stats_lock = threading.Lock()
+# 由其他快取結果（更多結果或更寬的年份範圍）回答的搜索數
+_reuse_stats = {"prefix": 0, "since_year": 0}
+
+def create_client(priority=None):
+    """
+    建立使用共享快取、速率限制與斷路器的 PubMed 客戶端
+    
+    批次請求（以及背景任務）在速率令牌不足時讓給互動請求
+    """
+    if priority is None:
+        priority = g.get('priority', 'interactive') if has_request_context() else 'batch'
+    reserve = BATCH_RATE_RESERVE if ADMISSION_ENABLED and priority == 'batch' else 0.0
+    return PubMedClient(api_key=API_KEY, base_url=BASE_URL, cache=cache,
+                        rate_limiter=rate_limiter, breaker=breaker,
+                        rate_reserve=reserve, key_pool=key_pool, deadlines=DEADLINES)
+
+def shared_client(priority):
+    """取得指定優先級的共用客戶端（其請求只在背景事件循環上執行）"""
+    with _clients_lock:
+        client = _clients.get(priority)
+        if client is None:
+            client = _clients[priority] = create_client(priority)
+        return client
+
+def disconnect_check():
+    """
+    返回檢查當前請求的客戶端是否已斷開的函數
+    
+    開發服務器與 gunicorn 會提供連接的 socket；可讀但讀不到資料（EOF）即表示
+    客戶端已關閉連接。無法取得 socket 時返回 None（不檢查）。
+    """
+    sock = request.environ.get('gunicorn.socket') or request.environ.get('werkzeug.socket')
+    if sock is None:
+        return None
+    
+    def disconnected():
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+        except ValueError:
+            # TLS socket 不支援 MSG_PEEK
+            return False
+        except OSError:
+            return True
+    return disconnected
+
+def run_upstream(key, call, priority, deadlines=None):
+    """
+    在共用事件循環上執行上游呼叫並等待結果
+    
+    call 接收客戶端並返回要執行的協程。等待不超過 total 截止時間，並在客戶端斷開時
+    放棄；相同 key 且各階段截止時間相同的並發呼叫共用一次執行（共用的呼叫只套用
+    發起者的階段截止時間）。total 由每個等待者各自計算，不影響共用。
+    正在剖析的請求改在請求線程上執行
+    """
+    deadlines = deadlines or DEADLINES
+    timeout = deadlines["total"]
+    if key is not None:
+        key = (key, tuple(sorted((stage, value) for stage, value in deadlines.items()
+                                 if stage != "total")))
+    if has_request_context() and g.get('profile') is not None:
+        return run_profiled(lambda client: asyncio.wait_for(call(client), timeout), priority)
+    return upstream.run(key, lambda: call(shared_client(priority)), timeout=timeout,
+                        disconnected=disconnect_check() if has_request_context() else None)
+
+def run_profiled(call, priority):
+    """
+    以請求本地的事件循環與客戶端在當前線程執行上游呼叫
+    
+    cProfile 只剖析請求線程，在共用事件循環上執行時剖析結果只剩等待鎖的時間
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        client = create_client(priority)
+        try:
+            return loop.run_until_complete(call(client))
+        finally:
+            loop.run_until_complete(client.close())
+    finally:
+        loop.close()
+
+def record_cache_status(status):
+    """記錄啟動後每分鐘的快取命中情況"""
+    minute = int((time.time() - BOOT_TIME) // 60)
+    if minute >= 60:
+        return
+    with _cache_stats_lock:
+        counts = _cache_stats.setdefault(minute, {"hit": 0, "stale": 0, "miss": 0})
+        counts[status["cache"]] += 1
+
+def record_reuse(status):
+    """統計由其他快取結果回答的搜索"""
+    if "reused" in status:
+        with _cache_stats_lock:
+            _reuse_stats[status["reused"]] += 1
+
+def stream_stats():
+    """逐步載入的首批結果時間與總時間百分位（毫秒）"""
+    timings = list(_stream_timings)
+    stats = {"requests": len(timings)}
+    for index, name in ((0, "first_result"), (1, "total")):
+        values = sorted(t[index] for t in timings)
+        for pct in (50, 99):
+            value = values[min(len(values) - 1, len(values) * pct // 100)] if values else 0.0
+            stats[f"{name}_p{pct}_ms"] = round(value * 1000, 1)
+    return stats
+
+def cache_stats_since_boot():
+    """每分鐘的快取命中率，過期結果也算作命中"""
+    with _cache_stats_lock:
+        stats = []
+        for minute, counts in sorted(_cache_stats.items()):
+            total = sum(counts.values())
+            stats.append(dict(counts, minute=minute,
+                              hit_rate=(counts["hit"] + counts["stale"]) / total))
+        return stats
+
+def save_snapshot():
+    """將最常見查詢的快取寫入快照，供下次啟動時還原"""
+    if not (cache and SNAPSHOT_PATH):
+        return
+    try:
+        os.makedirs(os.path.dirname(SNAPSHOT_PATH) or ".", exist_ok=True)
+        count = cache.snapshot(SNAPSHOT_PATH, SNAPSHOT_TOP_N)
+        app.logger.info("已保存 %d 個查詢的快取快照到 %s", count, SNAPSHOT_PATH)
+    except Exception as e:
+        app.logger.warning("保存快取快照失敗: %s", e)
+
+def shutdown():
+    """進程退出時保存快取快照，並釋放未完成的預熱租約，讓下次啟動立即預熱"""
+    save_snapshot()
+    if warmer:
+        warmer.release()
+
+def request_priority():
+    """判斷請求的優先級；客戶端只能透過 X-Priority 降級為 batch"""
+    if request.path in INTERACTIVE_PATHS and request.headers.get('X-Priority') != 'batch':
+        return 'interactive'
+    return 'batch'
+
+@app.before_request
+def admit_request():
+    """在處理請求前取得准入名額，超載時直接返回 429"""
+    g.priority = request_priority()
+    if not ADMISSION_ENABLED or request.path in ADMISSION_EXEMPT or request.path.startswith('/static'):
+        return None
+    
+    client_id = (CLIENT_ID_HEADER and request.headers.get(CLIENT_ID_HEADER)) or request.remote_addr
+    slot = admission.admit(g.priority, client_id)
+    try:
+        slot.__enter__()
+    except AdmissionRejected as e:
+        response = jsonify({"error": "服務器繁忙，請稍後再試", "reason": e.reason})
+        response.status_code = 429
+        response.headers["Retry-After"] = str(int(e.retry_after))
+        return response
+    g.admission_slot = slot
+    return None
+
+@app.teardown_request
+def release_request(exc):
+    """釋放准入名額"""
+    slot = g.pop('admission_slot', None)
+    if slot is not None:
+        slot.__exit__(None, None, None)
+
+@app.before_request
+def start_profile():
+    """按需以 cProfile 剖析請求；未啟用時不做任何事"""
+    if not profiler.enabled or request.path.startswith('/api/profiles'):
+        return None
+    g.profile_requested = profiler.authorized(request.headers.get('X-Profile-Token'))
+    g.profile = profiler.start(g.profile_requested, f"{request.method} {request.path}")
+    return None
+
+@app.after_request
+def add_profile_header(response):
+    """告知剖析結果的名稱（串流響應在結束後才寫入）"""
+    if not profiler.enabled:
+        return response
+    session = g.get('profile')
+    if g.get('profile_requested'):
+        response.headers["X-Profile"] = session.name if session else "busy"
+    if session is not None:
+        g.profile_status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_profile(exc):
+    """停止剖析並保存結果"""
+    session = g.pop('profile', None)
+    if session is not None:
+        try:
+            profiler.finish(session, {
+                "method": request.method,
+                "path": request.path,
+                "query_string": request.query_string.decode("utf-8", "replace"),
+                "status": g.get('profile_status', 500),
+            })
+        except Exception as e:
+            app.logger.warning("保存性能剖析結果失敗: %s", e)
+
+def profiling_authorized():
+    """剖析結果僅限持有 PROFILING_TOKEN 的請求存取"""
+    return profiler.authorized(request.headers.get('X-Profile-Token'))
+
+def parse_bool(value):
+    """解析表單或 JSON 中的布林值"""
+    if isinstance(value, str):
+        return value.lower() in ("true", "1", "t", "on", "yes")
+    return bool(value)
+
+def parse_deadlines(data):
+    """讀取請求中的各階段截止時間，不超過服務器上限"""
+    deadlines = dict(DEADLINES)
+    requested = data.get('deadlines') or {}
+    if isinstance(requested, dict):
+        for stage, value in requested.items():
+            if stage in deadlines:
+                try:
+                    deadlines[stage] = min(float(value), deadlines[stage])
+                except (TypeError, ValueError):
+                    pass
+    return deadlines
+
+def run_search(full_query, max_results, sort, deadlines=None):
+    """
+    執行搜索並返回 (結果, 快取狀態)
+    
+    過期的快取結果會直接返回，並在背景刷新；相同的並發搜索只執行一次
+    """
+    deadlines = deadlines or DEADLINES
+    priority = g.get('priority', 'interactive') if has_request_context() else 'batch'
+    results, status = run_upstream(
+        ("search", full_query, max_results, sort),
+        lambda client: client.search_with_status(
+            query=full_query,
+            max_results=max_results,
+            sort=sort,
+            deadlines=deadlines
+        ),
+        priority, deadlines)
+    
+    record_search(full_query, max_results, sort, status)
+    return results, status
+
+def record_search(full_query, max_results, sort, status):
+    """記錄查詢日誌與快取狀態，過期結果在背景刷新"""
+    if cache:
+        # 與快取鍵一致的規範化參數
+        cache.log_query(SearchQuery.from_term(full_query, max_results, sort).params)
+    record_cache_status(status)
+    record_reuse(status)
+    if status["cache"] == "stale":
+        schedule_refresh(full_query, max_results, sort)
+
+def schedule_refresh(full_query, max_results, sort):
+    """在背景線程中刷新過期的查詢，同一查詢只刷新一次"""
+    key = (full_query, max_results, sort)
+    with _refreshing_lock:
+        if key in _refreshing or breaker.retry_after():
+            return
+        _refreshing.add(key)
+    
+    def refresh():
+        loop = asyncio.new_event_loop()
+        try:
+            client = create_client()
+            try:
+                loop.run_until_complete(client.search_with_status(
+                    query=full_query, max_results=max_results, sort=sort,
+                    deadlines=DEADLINES, refresh=True))
+            finally:
+                loop.run_until_complete(client.close())
+        except Exception as e:
+            app.logger.warning("背景刷新失敗 %r: %s", full_query, e)
+        finally:
+            loop.close()
+            with _refreshing_lock:
+                _refreshing.discard(key)
+    
+    threading.Thread(target=refresh, daemon=True).start()
+
+def add_cache_headers(response, status):
+    """標示結果是否來自快取及其新鮮度"""
+    response.headers["X-Cache"] = status["cache"].upper()
+    response.headers["Age"] = str(int(status["age"]))
+    if status["cache"] == "stale":
+        response.headers["Warning"] = '110 - "Response is Stale"'
+    return response
+
+def upstream_error(e):
+    """將上游錯誤轉換為 JSON 錯誤響應"""
+    if isinstance(e, ClientDisconnected):
+        # 客戶端已離開，不會讀取響應
+        return Response(status=499)
+    if isinstance(e, CircuitOpenError):
+        response = jsonify({"error": "PubMed 服務暫時不可用，請稍後再試"})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(int(e.retry_after) + 1)
+        return response
+    if isinstance(e, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return jsonify({"error": "PubMed 請求超時"}), 504
+    if isinstance(e, ArticleNotFoundError):
+        return jsonify({"error": str(e)}), 404
+    return jsonify({"error": str(e)}), 500
+
+def group_similar(results):
+    """每組相似文章只保留一篇代表（NumPy 僅在需要時才載入）"""
+    from pubmed_similarity import group_similar as group
+    return group(results)
 
 # 主頁路由
 @app.route('/')
 def index():
     return render_template('index.html')
 
+# 存活檢查：進程能處理請求即可
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({"status": "ok"})
+
+# 就緒檢查：快取可用時返回 200，並報告上游與預熱狀態
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    checks = {"cache": "disabled"}
+    ready = True
+    if cache:
+        try:
+            cache.ping()
+            checks["cache"] = "ok"
+        except Exception as e:
+            checks["cache"] = f"error: {e}"
+            ready = False
+    
+    retry_after = breaker.retry_after()
+    checks["upstream"] = {
+        "base_url": BASE_URL,
+        "circuit_breaker": breaker.state,
+        "retry_after": retry_after,
+        "api_keys": len(key_pool) if key_pool else int(bool(API_KEY)),
+    }
+    checks["warmup"] = warmer.status()["state"] if warmer else "disabled"
+    
+    response = jsonify(dict(checks, status="ready" if ready else "not_ready"))
+    response.status_code = 200 if ready else 503
+    return response
+
+# API：運行指標
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        "admission": admission.metrics(),
+        "circuit_breaker": breaker.state,
+        "api_keys": key_pool.metrics() if key_pool else [],
+        "warmup": warmer.status() if warmer else None,
+        "cache_since_boot": cache_stats_since_boot(),
+        "result_reuse": dict(_reuse_stats),
+        "streaming": stream_stats(),
+        "profiling": dict(profiler.stats, enabled=profiler.enabled),
+        "upstream": upstream.metrics(),
+    })
+
 # API：搜索
 @app.route('/api/search', methods=['POST'])
 def search():
@@ -36,49 +514,198 @@ def search():
     since_year = data.get('since_year')
     
     # 構建完整查詢
-    full_query = query
-    if since_year:
-        full_query = f"({query}) AND {since_year}:3000[PDAT]"
-    
-    # 創建一個新的事件循環來執行非同步函數
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    full_query = build_query(query, since_year)
     
     try:
-        # 執行搜索
-        client = PubMedClient(api_key=API_KEY)
-        try:
-            results = loop.run_until_complete(client.search(
-                query=full_query,
-                max_results=max_results,
-                sort=sort
-            ))
-            return jsonify(results)
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
-        finally:
-            loop.run_until_complete(client.close())
-    finally:
-        loop.close()
+        results, status = run_search(full_query, max_results, sort, parse_deadlines(data))
+    except Exception as e:
+        return upstream_error(e)
+    
+    # 每組相似文章只保留一篇代表
+    if parse_bool(data.get('group_similar', False)):
+        results = group_similar(results)
+    
+    return add_cache_headers(jsonify(results), status)
 
 # API：獲取單篇文章詳情
 @app.route('/api/article/<pmid>', methods=['GET'])
 def get_article(pmid):
-    # 創建一個新的事件循環來執行非同步函數
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    try:
+        article = run_upstream(("article", pmid), lambda client: client.get_article_details(pmid),
+                               g.priority)
+    except Exception as e:
+        return upstream_error(e)
+    return jsonify(article)
+
+# 支援的文章關聯類型
+LINKNAMES = {
+    "pubmed_pubmed",           # 相似文章
+    "pubmed_pubmed_citedin",   # 被引用
+    "pubmed_pubmed_refs",      # 參考文獻
+}
+MAX_GRAPH_HOPS = int(os.getenv("MAX_GRAPH_HOPS", "3"))
+MAX_GRAPH_NODES = int(os.getenv("MAX_GRAPH_NODES", "10000"))
+
+# API：文章關聯圖
+@app.route('/api/graph', methods=['POST'])
+def graph():
+    data = request.json or {}
+    
+    pmids = [str(pmid) for pmid in data.get('pmids', []) if str(pmid).isdigit()]
+    if not pmids:
+        return jsonify({"error": "pmids 參數不能為空"}), 400
+    
+    linkname = data.get('linkname', 'pubmed_pubmed')
+    if linkname not in LINKNAMES:
+        return jsonify({"error": f"不支援的 linkname，可用: {', '.join(sorted(LINKNAMES))}"}), 400
+    
+    hops = min(int(data.get('hops', 1)), MAX_GRAPH_HOPS)
+    max_neighbors = data.get('max_neighbors')
+    max_neighbors = int(max_neighbors) if max_neighbors else None
+    max_nodes = min(int(data.get('max_nodes', MAX_GRAPH_NODES)), MAX_GRAPH_NODES)
     
     try:
-        client = PubMedClient(api_key=API_KEY)
+        result = run_upstream(
+            ("graph", tuple(pmids), linkname, hops, max_neighbors, max_nodes),
+            lambda client: client.expand_graph(
+                pmids, linkname=linkname, hops=hops,
+                max_neighbors=max_neighbors, max_nodes=max_nodes
+            ),
+            g.priority, parse_deadlines(data))
+    except Exception as e:
+        return upstream_error(e)
+    return jsonify(result)
+
+# API：已保存的性能剖析結果
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    if not profiling_authorized():
+        return jsonify({"error": "需要有效的 X-Profile-Token"}), 403
+    return jsonify(profiler.list())
+
+# API：下載 pstats 檔案，或以 ?format=text 查看摘要
+@app.route('/api/profiles/<name>', methods=['GET'])
+def get_profile(name):
+    if not profiling_authorized():
+        return jsonify({"error": "需要有效的 X-Profile-Token"}), 403
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'calls'):
+            return jsonify({"error": "sort 只能是 cumulative、tottime 或 calls"}), 400
+        summary = profiler.summary(name, sort=sort)
+        if summary is None:
+            return jsonify({"error": "找不到剖析結果"}), 404
+        return Response(summary, mimetype='text/plain')
+    path = profiler.path(name)
+    if path is None:
+        return jsonify({"error": "找不到剖析結果"}), 404
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=f"{name}.pstats")
+
+# 文章欄式快照（由快取中的所有文章生成，以 mmap 載入）
+ANALYTICS_PATH = os.getenv("ANALYTICS_PATH", os.path.join(os.path.dirname(CACHE_PATH), "articles.columns")
+                           if CACHE_PATH else "")
+# 快照超過此時間（秒）後在背景重建，納入新快取的文章
+ANALYTICS_TTL = float(os.getenv("ANALYTICS_TTL", "3600"))
+MAX_ANALYTICS_TOP = 100
+_columns = None
+_columns_mtime = None
+_columns_lock = threading.Lock()
+_columns_rebuilding = False
+
+def load_columns():
+    """載入欄式快照；快照不存在時從快取生成，超過 ANALYTICS_TTL 時在背景重建"""
+    global _columns, _columns_mtime
+    from pubmed_columnar import ArticleColumns, export_cache
+    
+    meta_path = os.path.join(ANALYTICS_PATH, "meta.json")
+    with _columns_lock:
+        if _columns is None and not os.path.exists(meta_path):
+            export_cache(cache, ANALYTICS_PATH)
+        for attempt in range(3):
+            try:
+                # 其他線程或進程可能已重建快照
+                mtime = os.path.getmtime(meta_path)
+                if _columns is None or mtime != _columns_mtime:
+                    _columns = ArticleColumns.load(ANALYTICS_PATH)
+                    _columns_mtime = mtime
+                break
+            except FileNotFoundError:
+                # 快照正在替換中（或已被刪除）：沿用已載入的快照，必要時重建
+                schedule_columns_rebuild()
+                if _columns is not None:
+                    return _columns
+                if attempt == 2:
+                    raise
+                time.sleep(0.1)
+        if time.time() - mtime > ANALYTICS_TTL:
+            schedule_columns_rebuild()
+        return _columns
+
+def schedule_columns_rebuild():
+    """在背景重建過期的欄式快照，所有進程中同時只有一個在重建"""
+    global _columns_rebuilding
+    if _columns_rebuilding or not cache.try_lease("analytics", 600):
+        return
+    _columns_rebuilding = True
+    
+    def rebuild():
+        global _columns_rebuilding
+        from pubmed_columnar import export_cache
         try:
-            article = loop.run_until_complete(client.get_article_details(pmid))
-            return jsonify(article)
+            export_cache(cache, ANALYTICS_PATH)
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
+            app.logger.warning("重建欄式快照失敗: %s", e)
         finally:
-            loop.run_until_complete(client.close())
-    finally:
-        loop.close()
+            cache.release_lease("analytics")
+            _columns_rebuilding = False
+    
+    threading.Thread(target=rebuild, name="analytics-rebuild", daemon=True).start()
+
+def parse_year(value):
+    """解析可選的年份參數"""
+    if value is None or not str(value).strip():
+        return None
+    return int(value)
+
+# API：文獻計量統計
+@app.route('/api/analytics', methods=['POST'])
+def analytics():
+    data = request.json or {}
+    
+    try:
+        top = min(int(data.get('top', 10)), MAX_ANALYTICS_TOP)
+        since_year = parse_year(data.get('since_year'))
+        until_year = parse_year(data.get('until_year'))
+    except ValueError:
+        return jsonify({"error": "top、since_year 與 until_year 必須是整數"}), 400
+    if top < 1:
+        return jsonify({"error": "top 必須至少為 1"}), 400
+    
+    query = data.get('query', '')
+    if query:
+        # 統計一次搜索的結果
+        full_query = build_query(query, since_year)
+        try:
+            results, status = run_search(full_query, int(data.get('max_results', 10)),
+                                         data.get('sort', 'relevance'), parse_deadlines(data))
+        except Exception as e:
+            return upstream_error(e)
+        from pubmed_columnar import ArticleColumns
+        columns = ArticleColumns.from_articles(results)
+        mask = columns.select(until_year=until_year)
+        return add_cache_headers(jsonify(columns.aggregate(mask, top)), status)
+    
+    # 統計快取中的所有文章（可按 PMID 與年份篩選）
+    if not (cache and ANALYTICS_PATH):
+        return jsonify({"error": "未啟用快取，請提供 query 參數"}), 400
+    
+    pmids = data.get('pmids')
+    if pmids is not None:
+        pmids = [str(pmid) for pmid in pmids if str(pmid).isdigit()]
+    
+    columns = load_columns()
+    mask = columns.select(pmids=pmids, since_year=since_year, until_year=until_year)
+    return jsonify(columns.aggregate(mask, top))
 
 # API：生成Claude友好格式
 @app.route('/api/claude_format', methods=['POST'])
@@ -94,61 +721,20 @@ def claude_format():
     since_year = data.get('since_year')
     
     # 構建完整查詢
-    full_query = query
-    if since_year:
-        full_query = f"({query}) AND {since_year}:3000[PDAT]"
-    
-    # 創建一個新的事件循環來執行非同步函數
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    full_query = build_query(query, since_year)
     
     try:
-        # 執行搜索
-        client = PubMedClient(api_key=API_KEY)
-        try:
-            results = loop.run_until_complete(client.search(
-                query=full_query,
-                max_results=max_results,
-                sort=sort
-            ))
-            
-            # 格式化為Markdown格式
-            formatted = f"# PubMed搜索結果: {query}\n\n"
-            
-            if not results:
-                formatted += "未找到結果。\n"
-            else:
-                for i, article in enumerate(results, 1):
-                    # 標題和基本信息
-                    formatted += f"## {i}. {article['title']}\n"
-                    formatted += f"**期刊**: {article['journal']}, **日期**: {article['publication_date']}\n\n"
-                    
-                    # 摘要
-                    if article['abstract']:
-                        formatted += f"**摘要**: {article['abstract']}\n\n"
-                    else:
-                        formatted += "**摘要**: 未提供\n\n"
-                    
-                    # 作者
-                    if article['authors']:
-                        formatted += f"**作者**: {', '.join(article['authors'])}\n\n"
-                    
-                    # 標識符和連結
-                    formatted += f"**PMID**: {article['pmid']}"
-                    if article['doi']:
-                        formatted += f", **DOI**: {article['doi']}"
-                    formatted += f"\n**鏈接**: {article['url']}\n\n"
-                    
-                    if i < len(results):
-                        formatted += "---\n\n"
-            
-            return jsonify({"formatted_text": formatted})
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
-        finally:
-            loop.run_until_complete(client.close())
-    finally:
-        loop.close()
+        results, status = run_search(full_query, max_results, sort, parse_deadlines(data))
+    except Exception as e:
+        return upstream_error(e)
+    
+    if parse_bool(data.get('group_similar', False)):
+        results = group_similar(results)
+    
+    # 格式化為Markdown格式
+    formatted = format_for_claude(query, results)
+    
+    return add_cache_headers(jsonify({"formatted_text": formatted}), status)
 
 # Web表單搜索
 @app.route('/search', methods=['POST'])
@@ -162,75 +748,141 @@ def web_search():
     if not query:
         return render_template('index.html', error="請輸入搜索詞")
     
+    # 逐步載入：先返回頁面，結果經 SSE 陸續送達（合併相似文章需要全部結果）
+    if (format_type == 'json' and parse_bool(request.form.get('progressive', False))
+            and not parse_bool(request.form.get('group_similar', False))):
+        stream_url = url_for('search_stream', query=query, max_results=max_results,
+                             sort=sort, since_year=since_year or '')
+        return render_template('results.html',
+                        query=query,
+                        stream_url=stream_url,
+                        format_type='json')
+    
     # 直接執行搜索，不通過API
     # 構建完整查詢
-    full_query = query
-    if since_year and since_year.strip():
-        try:
-            year = int(since_year)
-            full_query = f"({query}) AND {year}:3000[PDAT]"
-        except ValueError:
-            pass
-    
-    # 創建一個新的事件循環來執行非同步函數
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    full_query = build_query(query, since_year)
     
     try:
-        client = PubMedClient(api_key=API_KEY)
+        results, status = run_search(full_query, max_results, sort)
+    except ClientDisconnected:
+        return Response(status=499)
+    except Exception as e:
+        return render_template('index.html', error=f"搜索錯誤: {str(e)}")
+    
+    if parse_bool(request.form.get('group_similar', False)):
+        results = group_similar(results)
+    
+    if format_type == 'claude':
+        # 格式化為Markdown格式
+        formatted = format_for_claude(query, results)
+        return render_template('results.html', 
+                        query=query,
+                        formatted_text=formatted,
+                        format_type='claude')
+    else:
+        return render_template('results.html', 
+                        query=query,
+                        results=results,
+                        format_type='json')
+
+# 在背景預熱快取，不延遲服務啟動
+warmer = (CacheWarmer(cache, lambda: create_client('batch'), top_n=WARMUP_TOP_N,
+                      snapshot_path=SNAPSHOT_PATH or None, deadlines=DEADLINES)
+          if cache and WARMUP_ENABLED else None)
+if warmer:
+    warmer.start()
+
+def sse_event(event, data):
+    """格式化一個 SSE 事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# 逐步載入搜索結果（SSE），每個事件是服務器渲染好的一頁文章
+@app.route('/search/stream', methods=['GET'])
+def search_stream():
+    started = time.perf_counter()
+    query = request.args.get('query', '')
+    if not query:
+        return jsonify({"error": "查詢參數不能為空"}), 400
+    
+    max_results = int(request.args.get('max_results', 10))
+    sort = request.args.get('sort', 'relevance')
+    page_size = max(1, min(int(request.args.get('page_size', STREAM_PAGE_SIZE)), MAX_STREAM_PAGE_SIZE))
+    full_query = build_query(query, request.args.get('since_year'))
+    
+    # 各批次在共用事件循環上執行；客戶端斷開時取消正在進行的批次。
+    # 正在剖析的請求改用請求本地的事件循環與客戶端（見 run_profiled）
+    profiled = g.get('profile') is not None
+    loop = asyncio.new_event_loop() if profiled else None
+    client = create_client(g.priority) if profiled else shared_client(g.priority)
+    batches = client.search_batches(
+        query=full_query, max_results=max_results, sort=sort,
+        deadlines=DEADLINES, first_batch=page_size)
+    disconnected = disconnect_check()
+    
+    def step(fn):
+        if profiled:
+            return loop.run_until_complete(fn())
+        return upstream.run(None, fn, disconnected=disconnected)
+    
+    def generate():
+        meta_sent = False
+        pending = []
+        sent = 0
+        first_result = None
         try:
-            results = loop.run_until_complete(client.search(
-                query=full_query,
-                max_results=max_results,
-                sort=sort
-            ))
-            
-            if format_type == 'claude':
-                # 格式化為Markdown格式
-                formatted = f"# PubMed搜索結果: {query}\n\n"
+            while True:
+                try:
+                    articles, status = step(batches.__anext__)
+                except StopAsyncIteration:
+                    break
                 
-                if not results:
-                    formatted += "未找到結果。\n"
-                else:
-                    for i, article in enumerate(results, 1):
-                        # 標題和基本信息
-                        formatted += f"## {i}. {article['title']}\n"
-                        formatted += f"**期刊**: {article['journal']}, **日期**: {article['publication_date']}\n\n"
-                        
-                        # 摘要
-                        if article['abstract']:
-                            formatted += f"**摘要**: {article['abstract']}\n\n"
-                        else:
-                            formatted += "**摘要**: 未提供\n\n"
-                        
-                        # 作者
-                        if article['authors']:
-                            formatted += f"**作者**: {', '.join(article['authors'])}\n\n"
-                        
-                        # 標識符和連結
-                        formatted += f"**PMID**: {article['pmid']}"
-                        if article['doi']:
-                            formatted += f", **DOI**: {article['doi']}"
-                        formatted += f"\n**鏈接**: {article['url']}\n\n"
-                        
-                        if i < len(results):
-                            formatted += "---\n\n"
+                if not meta_sent:
+                    meta_sent = True
+                    record_search(full_query, max_results, sort, status)
+                    yield sse_event("meta", {"total": status["total"], "cache": status["cache"],
+                                             "page_size": page_size,
+                                             "pages": -(-status["total"] // page_size)})
                 
-                return render_template('results.html', 
-                                query=query,
-                                formatted_text=formatted,
-                                format_type='claude')
-            else:
-                return render_template('results.html', 
-                                query=query,
-                                results=results,
-                                format_type='json')
+                # 湊滿一頁再送出，最後不足一頁的部分在結束時送出
+                pending.extend(articles)
+                while len(pending) >= page_size:
+                    page, pending = pending[:page_size], pending[page_size:]
+                    yield sse_event("page", {"page": sent // page_size + 1, "start": sent,
+                                             "html": render_template('_articles.html', articles=page)})
+                    sent += len(page)
+                    first_result = first_result or time.perf_counter() - started
+            
+            if pending:
+                yield sse_event("page", {"page": sent // page_size + 1, "start": sent,
+                                         "html": render_template('_articles.html', articles=pending)})
+                sent += len(pending)
+                first_result = first_result or time.perf_counter() - started
+            
+            total = time.perf_counter() - started
+            first_result = first_result or total
+            _stream_timings.append((first_result, total))
+            yield sse_event("done", {"articles": sent,
+                                     "first_result_ms": round(first_result * 1000),
+                                     "total_ms": round(total * 1000)})
+        except ClientDisconnected:
+            return
         except Exception as e:
-            return render_template('index.html', error=f"搜索錯誤: {str(e)}")
+            yield sse_event("search_error", {"error": str(e)})
         finally:
-            loop.run_until_complete(client.close())
-    finally:
-        loop.close()
+            try:
+                step(batches.aclose)
+            except Exception:
+                # 已取消的批次可能仍在結束中
+                pass
+            if profiled:
+                loop.run_until_complete(client.close())
+                loop.close()
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers["Cache-Control"] = "no-cache"
+    # 關閉反向代理緩衝，讓每個事件立即送達
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 # 運行服務器
 if __name__ == '__main__':
@@ -238,6 +890,10 @@ if __name__ == '__main__':
         print(f"啟動 Claude PubMed 助手服務器... ")
         print(f"訪問 http://{HOST}:{PORT} 開始使用")
         
+        # 關閉時保存快取快照（SIGTERM 也正常退出以執行 atexit）
+        atexit.register(shutdown)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        
         # 直接使用 Flask 运行服務器
         app.run(host=HOST, port=PORT, debug=DEBUG)
         
@@ -0,0 +1,192 @@
+from typing import Dict, List, Any
+
+import numpy as np
+
+_EMPTY = np.uint32(0xFFFFFFFF)
+
+# Byte -> case-folded word byte, or 0 for separators. Words are runs of ASCII
+# letters and digits or non-ASCII (UTF-8) bytes.
+_FOLD = np.zeros(256, dtype=np.uint8)
+_FOLD[48:58] = np.arange(48, 58)
+_FOLD[97:123] = np.arange(97, 123)
+_FOLD[65:91] = np.arange(97, 123)
+_FOLD[128:] = np.arange(128, 256)
+
+# Random hash for each byte bigram
+_BIGRAM_TABLE = np.random.default_rng(12345).integers(
+    0, 2 ** 63, size=256 * 256, dtype=np.uint64)
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, spreads bits of 64-bit hashes"""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def shingle_hashes(texts: List[str], shingle_size: int = 3):
+    """
+    Hash the word shingles of every text in one vectorized pass
+
+    Words are runs of ASCII letters and digits (case-folded) or non-ASCII
+    bytes; everything else separates words. A word is hashed from the byte
+    bigrams it contains.
+
+    Returns:
+        Tuple of (hashes, doc_ids): 64-bit hashes of all word n-grams and the
+        index of the text each belongs to, sorted by text. Texts shorter than
+        ``shingle_size`` words produce no shingles.
+    """
+    raw = np.frombuffer("\0".join(t.replace("\0", " ") for t in texts).encode("utf-8"),
+                        dtype=np.uint8)
+    if raw.size == 0:
+        return np.empty(0, np.uint64), np.empty(0, np.int64)
+
+    folded = np.take(_FOLD, raw)
+    is_word = folded != 0
+    prev_word = np.concatenate(([False], is_word[:-1]))
+    next_word = np.concatenate((is_word[1:], [False]))
+    starts = np.flatnonzero(is_word & ~prev_word)
+    ends = np.flatnonzero(is_word & ~next_word) + 1
+    doc_of_word = np.searchsorted(np.flatnonzero(raw == 0), starts)
+
+    # Bigram k is (byte k-1, byte k) with separators as 0, so the bigrams
+    # starts..ends of a word cover it including both boundaries
+    padded = np.concatenate(([np.uint8(0)], folded, [np.uint8(0)])).astype(np.uint16)
+    bigrams = (padded[:-1] << 8) | padded[1:]
+
+    with np.errstate(over="ignore"):
+        # Word hash = sum of its bigram hashes, from prefix sums
+        prefix = np.concatenate(([np.uint64(0)], np.cumsum(np.take(_BIGRAM_TABLE, bigrams))))
+        words = _mix(prefix[ends + 1] - prefix[starts])
+
+        n = words.size - shingle_size + 1
+        if n <= 0:
+            return np.empty(0, np.uint64), np.empty(0, np.int64)
+
+        shingles = np.zeros(n, dtype=np.uint64)
+        for offset in range(shingle_size):
+            shingles = _mix(shingles ^ words[offset:offset + n])
+
+    # Drop n-grams that span two texts
+    valid = doc_of_word[:n] == doc_of_word[shingle_size - 1:]
+    return shingles[valid], doc_of_word[:n][valid]
+
+
+def minhash_signatures(texts: List[str], num_perm: int = 64, shingle_size: int = 3,
+                       seed: int = 1, batch_size: int = 1024) -> np.ndarray:
+    """
+    Compute MinHash signatures for a batch of texts
+
+    Texts are processed ``batch_size`` at a time to bound memory use.
+
+    Returns:
+        uint32 array of shape (len(texts), num_perm). Rows of texts without
+        shingles are left at the maximum value.
+    """
+    rng = np.random.default_rng(seed)
+    # Random odd multipliers: x -> a*x + b is a permutation of 32-bit values
+    a = (rng.integers(0, 2 ** 31, size=num_perm, dtype=np.uint32) * np.uint32(2) + np.uint32(1))[:, None]
+    b = rng.integers(0, 2 ** 32, size=num_perm, dtype=np.uint32)[:, None]
+
+    signatures = np.full((len(texts), num_perm), _EMPTY, dtype=np.uint32)
+    for offset in range(0, len(texts), batch_size):
+        hashes, doc_ids = shingle_hashes(texts[offset:offset + batch_size], shingle_size)
+        if hashes.size == 0:
+            continue
+
+        values = (hashes >> np.uint64(32)).astype(np.uint32)
+        with np.errstate(over="ignore"):
+            # (num_perm, shingles) keeps each permutation contiguous for reduceat
+            permuted = a * values[None, :] + b
+
+        boundaries = np.flatnonzero(np.concatenate(([True], doc_ids[1:] != doc_ids[:-1])))
+        signatures[offset + doc_ids[boundaries]] = np.minimum.reduceat(
+            permuted, boundaries, axis=1).T
+
+    return signatures
+
+
+def cluster_signatures(signatures: np.ndarray, threshold: float = 0.5,
+                       rows_per_band: int = 4) -> List[List[int]]:
+    """
+    Group rows whose estimated Jaccard similarity reaches ``threshold``
+
+    Candidate pairs come from LSH banding and are verified against the full
+    signatures before being merged.
+
+    Returns:
+        Clusters as lists of row indices, ordered by their smallest index
+    """
+    count, num_perm = signatures.shape
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    has_shingles = np.flatnonzero((signatures != _EMPTY).any(axis=1))
+    sig = signatures[has_shingles]
+    rng = np.random.default_rng(0)
+    band_weights = rng.integers(1, 2 ** 63, size=rows_per_band, dtype=np.uint64)
+
+    with np.errstate(over="ignore"):
+        for band in range(num_perm // rows_per_band):
+            cols = sig[:, band * rows_per_band:(band + 1) * rows_per_band].astype(np.uint64)
+            keys = _mix((cols * band_weights).sum(axis=1, dtype=np.uint64))
+            order = np.argsort(keys, kind="stable")
+            same = np.flatnonzero(keys[order[1:]] == keys[order[:-1]])
+            if same.size == 0:
+                continue
+
+            left, right = order[same], order[same + 1]
+            similarity = (sig[left] == sig[right]).mean(axis=1)
+            for i, j in zip(has_shingles[left[similarity >= threshold]],
+                            has_shingles[right[similarity >= threshold]]):
+                root_i, root_j = find(int(i)), find(int(j))
+                if root_i != root_j:
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(count):
+        clusters.setdefault(find(i), []).append(i)
+    return list(clusters.values())
+
+
+def group_similar(articles: List[Dict[str, Any]], threshold: float = 0.5,
+                  num_perm: int = 64, rows_per_band: int = 4) -> List[Dict[str, Any]]:
+    """
+    Collapse near-duplicate articles into one representative per cluster
+
+    The first article of each cluster in result order is kept, with the
+    other members listed under ``similar_articles``.
+
+    Args:
+        articles: Articles as returned by PubMedClient.search
+        threshold: Minimum estimated Jaccard similarity of title+abstract
+            word shingles for two articles to be grouped
+
+    Returns:
+        Representative articles in their original order
+    """
+    if not articles:
+        return []
+
+    texts = [f"{a.get('title', '')} {a.get('abstract', '')}" for a in articles]
+    signatures = minhash_signatures(texts, num_perm=num_perm)
+    clusters = cluster_signatures(signatures, threshold, rows_per_band)
+
+    grouped = []
+    for members in clusters:
+        representative = dict(articles[members[0]])
+        representative["similar_articles"] = [
+            {key: articles[i].get(key, "")
+             for key in ("pmid", "title", "journal", "publication_date", "url")}
+            for i in members[1:]
+        ]
+        grouped.append(representative)
+    return grouped
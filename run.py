@@ -9,6 +9,8 @@ import subprocess
 import webbrowser
 import time
 import platform
+import importlib.util
+import urllib.request
 from dotenv import load_dotenv
 
 # 加載環境變量
@@ -18,21 +20,17 @@ load_dotenv()
 HOST = os.getenv("HOST", "127.0.0.1")
 PORT = int(os.getenv("PORT", "8000"))
 DEBUG = os.getenv("DEBUG", "True").lower() in ("true", "1", "t")
+# 等待服務器就緒的最長時間（秒）與輪詢間隔
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "30"))
+READY_POLL_INTERVAL = 0.05
 
 def check_dependencies():
     """檢查必要的依賴是否已安裝"""
-    required = ["flask", "httpx", "python-dotenv"]
-    missing = []
+    required = {"flask": "flask", "httpx": "httpx", "python-dotenv": "dotenv", "numpy": "numpy"}
     
-    # 直接嘗試導入模塊
-    for package in required:
-        try:
-            module_name = package.replace('-', '_')
-            if module_name == "python_dotenv":
-                module_name = "dotenv"
-            __import__(module_name)
-        except ImportError:
-            missing.append(package)
+    # 只查找模塊而不導入，避免拖慢啟動
+    missing = [package for package, module_name in required.items()
+               if importlib.util.find_spec(module_name) is None]
     
     if missing:
         print("缺少以下依賴項：")
@@ -45,6 +43,19 @@ def check_dependencies():
     
     return True
 
+def wait_until_ready(proc):
+    """快速輪詢 /readyz，直到服務器就緒、進程退出或超時"""
+    deadline = time.monotonic() + READY_TIMEOUT
+    while time.monotonic() < deadline and proc.poll() is None:
+        try:
+            with urllib.request.urlopen(f"http://{HOST}:{PORT}/readyz", timeout=1) as resp:
+                if resp.status == 200:
+                    return True
+        except Exception:
+            pass
+        time.sleep(READY_POLL_INTERVAL)
+    return False
+
 def start_server():
     """啟動PubMed服務器"""
     try:
@@ -70,21 +81,16 @@ def start_server():
             # 創建一個永不結束的進程
             proc = subprocess.Popen(cmd)
         
-        # 等待服務器啟動
+        # 等待服務器就緒
         print("等待服務器啟動...")
-        max_retries = 5
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            time.sleep(1)
-            try:
-                # 檢查服務器是否已啟動
-                import urllib.request
-                urllib.request.urlopen(f"http://{HOST}:{PORT}")
-                break  # 成功連接，跳出循環
-            except Exception:
-                retry_count += 1
-                print(f"檢查服務器狀態... (第{retry_count}次嘗試)")
+        started = time.monotonic()
+        if wait_until_ready(proc):
+            print(f"服務器已就緒（{time.monotonic() - started:.2f} 秒）")
+        elif proc.poll() is not None:
+            print("服務器啟動失敗")
+            return proc
+        else:
+            print(f"服務器在 {READY_TIMEOUT:.0f} 秒內未就緒，仍嘗試開啟瀏覽器")
         
         # 自動打開瀏覽器
         print("自動開啟瀏覽器...")
@@ -0,0 +1,127 @@
+import time
+import asyncio
+import threading
+import concurrent.futures
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away while waiting for upstream work"""
+
+
+class _Flight:
+    """One upstream call in flight and the number of requests waiting for it"""
+
+    def __init__(self, future: concurrent.futures.Future):
+        self.future = future
+        self.waiters = 0
+
+
+class UpstreamRunner:
+    """
+    Run upstream calls on one background event loop per process
+
+    Calls made at the same time with the same ``key`` share a single task.
+    Each waiting request enforces its own deadline and, if given a
+    ``disconnected`` check, polls whether its client is still there. A
+    request that gives up only stops waiting; the task is cancelled when
+    its last waiter has left, which aborts the in-flight HTTP request
+    (closing its connection) or the wait for rate-limit tokens. Calls that
+    still have other waiters keep running.
+    """
+
+    def __init__(self, poll_interval: float = 0.05):
+        """
+        Args:
+            poll_interval: Seconds between client disconnect checks
+        """
+        self.poll_interval = poll_interval
+        self._loop = None
+        self._lock = threading.RLock()
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self.stats = {"calls": 0, "coalesced": 0, "disconnected": 0, "timed_out": 0, "cancelled": 0}
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background loop on first use (after any fork)"""
+        if self._loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="upstream-loop", daemon=True).start()
+            self._loop = loop
+        return self._loop
+
+    def run(self, key: Optional[Hashable], factory: Callable[[], Awaitable[Any]],
+            timeout: Optional[float] = None,
+            disconnected: Optional[Callable[[], bool]] = None) -> Any:
+        """
+        Run ``factory()`` on the background loop and wait for its result
+
+        Args:
+            key: Identifies identical calls to share, or None to never share
+            factory: Returns the awaitable to run; called on the loop thread
+            timeout: Seconds this caller waits at most
+            disconnected: Returns True once the caller's client has gone away
+
+        Raises:
+            asyncio.TimeoutError: ``timeout`` passed before the call finished
+            ClientDisconnected: ``disconnected`` returned True
+        """
+        with self._lock:
+            self.stats["calls"] += 1
+            flight = self._inflight.get(key) if key is not None else None
+            if flight is None:
+                flight = _Flight(asyncio.run_coroutine_threadsafe(self._execute(factory), self._get_loop()))
+                if key is not None:
+                    self._inflight[key] = flight
+                    flight.future.add_done_callback(lambda _: self._forget(key, flight))
+            else:
+                self.stats["coalesced"] += 1
+            flight.waiters += 1
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                wait = self.poll_interval if disconnected else None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._count("timed_out")
+                        raise asyncio.TimeoutError()
+                    wait = remaining if wait is None else min(wait, remaining)
+
+                done, _ = concurrent.futures.wait([flight.future], wait)
+                if done:
+                    return flight.future.result()
+                if disconnected is not None and disconnected():
+                    self._count("disconnected")
+                    raise ClientDisconnected()
+        finally:
+            self._leave(key, flight)
+
+    @staticmethod
+    async def _execute(factory: Callable[[], Awaitable[Any]]) -> Any:
+        return await factory()
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self.stats[field] += 1
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        with self._lock:
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+
+    def _leave(self, key: Optional[Hashable], flight: _Flight) -> None:
+        """Stop waiting; cancel the call if nobody else is waiting for it"""
+        with self._lock:
+            flight.waiters -= 1
+            if flight.waiters or flight.future.done():
+                return
+            if key is not None:
+                self._forget(key, flight)
+            self.stats["cancelled"] += 1
+        flight.future.cancel()
+
+    def metrics(self) -> Dict[str, int]:
+        """Counters plus the number of calls currently in flight"""
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._inflight))
@@ -0,0 +1,124 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, Any, Optional
+
+from pubmed_cache import SharedCache
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmer:
+    """
+    Restore a cache snapshot and re-run the most frequent searches after boot
+
+    Runs in a daemon thread so the server accepts requests straight away;
+    requests for searches that are not warm yet simply miss as on a cold
+    start. Every process restores the snapshot (existing entries are kept,
+    so this is idempotent), but only one process per cache file re-runs
+    searches at a time (a lease in the cache); the others report
+    ``"state": "skipped"``. The lease is released when the warm-up ends or
+    ``release`` is called on shutdown, and otherwise expires after
+    ``LEASE_SECONDS`` in case the process died while warming.
+    """
+
+    LEASE = "warmup"
+    LEASE_SECONDS = 600
+
+    def __init__(self, cache: SharedCache, client_factory: Callable,
+                 top_n: int = 100, snapshot_path: Optional[str] = None,
+                 deadlines: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            cache: Shared cache holding the query log
+            client_factory: Returns a new PubMedClient; it should yield
+                rate tokens to interactive traffic
+            top_n: Number of most frequent searches to re-run
+            snapshot_path: Snapshot to restore first, if the file exists
+        """
+        self.cache = cache
+        self.client_factory = client_factory
+        self.top_n = top_n
+        self.snapshot_path = snapshot_path
+        self.deadlines = deadlines
+        self._lock = threading.Lock()
+        self._status = {
+            "state": "idle",
+            "restored_queries": 0,
+            "restored_articles": 0,
+            "total": 0,
+            "warmed": 0,
+            "fresh": 0,
+            "failed": 0,
+            "started_at": None,
+            "finished_at": None,
+        }
+
+    def status(self) -> Dict[str, Any]:
+        """Progress of the warm-up"""
+        with self._lock:
+            return dict(self._status)
+
+    def _update(self, **changes) -> None:
+        with self._lock:
+            self._status.update(changes)
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self._status[field] += 1
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, name="cache-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def release(self) -> None:
+        """Release the warm-up lease if this process holds it"""
+        self.cache.release_lease(self.LEASE)
+
+    def run(self) -> None:
+        self._update(state="restoring", started_at=time.time())
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            try:
+                queries, articles = self.cache.restore(self.snapshot_path)
+                self._update(restored_queries=queries, restored_articles=articles)
+            except Exception as e:
+                logger.warning("Failed to restore cache snapshot %s: %s", self.snapshot_path, e)
+
+        if not self.cache.try_lease(self.LEASE, self.LEASE_SECONDS):
+            self._update(state="skipped", finished_at=time.time())
+            return
+        try:
+            self._warm()
+        finally:
+            self.release()
+            self._update(state="done", finished_at=time.time())
+
+    def _warm(self) -> None:
+        """Re-run the most frequent searches that are no longer fresh"""
+        top = self.cache.top_queries(self.top_n)
+        self._update(state="warming", total=len(top))
+
+        loop = asyncio.new_event_loop()
+        try:
+            client = self.client_factory()
+            try:
+                for entry in top:
+                    params = entry["params"]
+                    cached = self.cache.get_query(SharedCache.make_key(**params))
+                    if cached is not None and self.cache.is_fresh(cached[1]):
+                        self._count("fresh")
+                        continue
+                    try:
+                        loop.run_until_complete(client.search_with_status(
+                            **params, deadlines=self.deadlines, refresh=True))
+                        self._count("warmed")
+                    except Exception as e:
+                        logger.info("Warm-up search failed %r: %s", params.get("query"), e)
+                        self._count("failed")
+            finally:
+                loop.run_until_complete(client.close())
+        finally:
+            loop.close()